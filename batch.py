@@ -0,0 +1,169 @@
+""" Ejecucion en paralelo de muchas partidas sin ventana, para barrer parametros (Z, H, T, P) """
+
+import os
+import sys
+import json
+import argparse
+import itertools
+import multiprocessing as mp
+import numpy as np
+from random import Random
+from model import Controller
+from simulation import Simulation
+from collision import ESTRUCTURAS
+from metrics import MetricsWriter
+
+
+class PoliticaTienda():
+    # Jugador con guion: sube por la pista moviendose hacia el lado de la tienda
+    def __init__(self, seed):
+        # No usa azar, asi que no necesita estado
+        pass
+
+    def actuar(self, controller, estado, dt):
+        px, py = estado.playerPos
+        objetivo = 0.5 * estado.lado
+        controller.is_w_pressed = True
+        controller.is_s_pressed = False
+        controller.is_d_pressed = px < objetivo - 0.01
+        controller.is_a_pressed = px > objetivo + 0.01
+
+
+class PoliticaAleatoria():
+    # Jugador aleatorio: cada cierto tiempo elige al azar que teclas mantener presionadas
+    def __init__(self, seed, periodo=0.5):
+        self.rng = Random(seed)
+        self.periodo = periodo
+        self.reloj = periodo
+
+    def actuar(self, controller, estado, dt):
+        self.reloj += dt
+        if self.reloj >= self.periodo:
+            self.reloj = 0.0
+            controller.is_w_pressed = self.rng.random() < 0.6
+            controller.is_s_pressed = self.rng.random() < 0.2
+            controller.is_a_pressed = self.rng.random() < 0.3
+            controller.is_d_pressed = self.rng.random() < 0.3
+
+
+POLITICAS = {"tienda": PoliticaTienda, "aleatoria": PoliticaAleatoria}
+
+
+def jugar(argumentos):
+    # Se juega una partida completa y se retorna su resumen.
+    # Es una funcion de nivel de modulo para poder ejecutarse en otro proceso
+    Z, H, T, P, politica, seed, dt, tiempoMax, colisiones, directorioMetricas = argumentos
+
+    # Opcionalmente, cada partida escribe sus metricas por tick en su propio CSV
+    metricas = None
+    if directorioMetricas is not None:
+        nombre = "partida_Z%d_H%d_T%g_P%g_%s_%d.csv" % (Z, H, T, P, politica, seed)
+        metricas = MetricsWriter(os.path.join(directorioMetricas, nombre))
+
+    controller = Controller()
+    sim = Simulation(Z, H, T, P, controller, seed=seed, colisiones=colisiones, metricas=metricas)
+    estado = sim.vista()
+    jugador = POLITICAS[politica](seed)
+
+    tiempoInfeccion = None # Momento en que el jugador se infecto
+    zombies = [] # Cantidad de zombies en pantalla, una muestra por segundo
+    proximaMuestra = 0.0
+
+    while not estado.fin and estado.tiempo < tiempoMax:
+        jugador.actuar(controller, estado, dt)
+        sim.step(dt)
+
+        if tiempoInfeccion is None and estado.playerInfectado:
+            tiempoInfeccion = estado.tiempo
+        if estado.tiempo >= proximaMuestra:
+            zombies.append(int(estado.eszombie.sum()))
+            proximaMuestra += 1.0
+
+    if metricas is not None:
+        metricas.cerrar()
+
+    if estado.gano:
+        resultado = "gana"
+    elif estado.perdio:
+        resultado = "pierde"
+    else:
+        resultado = "tiempo"
+
+    return {"Z": Z, "H": H, "T": T, "P": P, "politica": politica, "seed": seed,
+            "resultado": resultado, "tiempo": estado.tiempo,
+            "tiempoInfeccion": tiempoInfeccion, "zombies": zombies}
+
+
+def agregar(partidas):
+    # Se agrupan las partidas por parametros y se calculan tasas y promedios
+    grupos = {}
+    for partida in partidas:
+        clave = (partida["Z"], partida["H"], partida["T"], partida["P"], partida["politica"])
+        grupos.setdefault(clave, []).append(partida)
+
+    resumen = []
+    for (Z, H, T, P, politica), grupo in sorted(grupos.items()):
+        n = len(grupo)
+        infecciones = [p["tiempoInfeccion"] for p in grupo if p["tiempoInfeccion"] is not None]
+
+        # Curva promedio de zombies; las partidas que terminaron antes mantienen su ultimo valor
+        largo = max(len(p["zombies"]) for p in grupo)
+        curvas = np.array([p["zombies"] + [p["zombies"][-1] if p["zombies"] else 0] * (largo - len(p["zombies"]))
+            for p in grupo], dtype=float)
+
+        resumen.append({
+            "Z": Z, "H": H, "T": T, "P": P, "politica": politica, "partidas": n,
+            "tasaVictoria": sum(p["resultado"] == "gana" for p in grupo) / n,
+            "tasaDerrota": sum(p["resultado"] == "pierde" for p in grupo) / n,
+            "tasaTiempo": sum(p["resultado"] == "tiempo" for p in grupo) / n,
+            "tiempoMedio": float(np.mean([p["tiempo"] for p in grupo])),
+            "tasaInfeccion": len(infecciones) / n,
+            "tiempoInfeccionMedio": float(np.mean(infecciones)) if infecciones else None,
+            "zombiesMedio": curvas.mean(axis=0).tolist() if largo > 0 else []})
+    return resumen
+
+
+def barrer(Zs, Hs, Ts, Ps, politicas, partidas, seed=0, dt=1/60, tiempoMax=120.0, procesos=None, colisiones="grilla", directorioMetricas=None):
+    # Se juegan "partidas" partidas por cada combinacion de parametros, usando todos los nucleos
+    if directorioMetricas is not None:
+        os.makedirs(directorioMetricas, exist_ok=True)
+
+    trabajos = []
+    for k, (Z, H, T, P, politica) in enumerate(itertools.product(Zs, Hs, Ts, Ps, politicas)):
+        for i in range(partidas):
+            trabajos.append((Z, H, T, P, politica, seed + k * partidas + i, dt, tiempoMax, colisiones, directorioMetricas))
+
+    with mp.Pool(procesos) as workers:
+        resultados = workers.map(jugar, trabajos, chunksize=1)
+    return agregar(resultados)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Barrido de parametros de Beauchefville sin ventana")
+    parser.add_argument("--Z", type=int, nargs="+", default=[5], help="Zombies por oleada")
+    parser.add_argument("--H", type=int, nargs="+", default=[10], help="Humanos por oleada")
+    parser.add_argument("--T", type=float, nargs="+", default=[2.0], help="Segundos entre oleadas")
+    parser.add_argument("--P", type=float, nargs="+", default=[0.3], help="Probabilidad de contagio/conversion")
+    parser.add_argument("--politica", nargs="+", default=["tienda", "aleatoria"], choices=sorted(POLITICAS))
+    parser.add_argument("--partidas", type=int, default=10, help="Partidas por combinacion")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dt", type=float, default=1/60, help="Paso de tiempo simulado")
+    parser.add_argument("--tiempo-max", type=float, default=120.0, help="Duracion maxima de una partida")
+    parser.add_argument("--colisiones", default="grilla", choices=sorted(ESTRUCTURAS),
+        help="Estructura de colisiones: grilla (SpatialHash) o sweep (SweepAndPrune)")
+    parser.add_argument("--metricas", default=None,
+        help="Directorio donde cada partida escribe un CSV con sus metricas por tick")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos (por defecto, todos los nucleos)")
+    parser.add_argument("--salida", default=None, help="Archivo JSON de salida (por defecto, salida estandar)")
+    args = parser.parse_args()
+
+    resumen = barrer(args.Z, args.H, args.T, args.P, args.politica, args.partidas,
+        args.seed, args.dt, args.tiempo_max, args.procesos, args.colisiones, args.metricas)
+
+    if args.salida is None:
+        json.dump(resumen, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.salida, "w") as f:
+            json.dump(resumen, f, indent=2)
@@ -0,0 +1,245 @@
+""" Micro benchmarks de transformaciones, curvas, colisiones y recorrido del grafo de escena.
+Uso: python benchmark.py [--salida resultados.json] [--rapido]
+El resultado es un JSON, para poder comparar entre commits """
+
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import numpy as np
+import grafica.transformations as tr
+import grafica.scene_graph as sg
+import grafica.easy_shaders as es
+import grafica.texture_atlas as ta
+import grafica.basic_shapes as bs
+import grafica.recording_gl as rgl
+from curves import hermiteRand, bezierRand
+from model import Player
+from collision import SpatialHash
+from escenarios import crearMultitud
+
+
+def medir(funcion, repeticiones=5, numero=None, minimo=0.05):
+    # Se mide el tiempo por llamada de funcion. Si no se entrega numero, se elige para que
+    # cada repeticion dure al menos minimo segundos. Se retornan estadisticas en segundos
+    if numero is None:
+        numero = 1
+        while True:
+            t0 = time.perf_counter()
+            for _ in range(numero):
+                funcion()
+            if time.perf_counter() - t0 >= minimo or numero >= 1 << 20:
+                break
+            numero *= 2
+
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        for _ in range(numero):
+            funcion()
+        tiempos.append((time.perf_counter() - t0) / numero)
+    tiempos = np.array(tiempos)
+    return {"mejor": float(tiempos.min()), "mediana": float(np.median(tiempos)),
+            "media": float(tiempos.mean()), "desviacion": float(tiempos.std()),
+            "repeticiones": repeticiones, "llamadasPorRepeticion": numero}
+
+
+###################################################################################
+
+def crearProfundo(profundidad):
+    # Cadena de nodos: n0 -> n1 -> n2 -> ... -> hoja
+    # Se construye desde la hoja hacia arriba, asi cada nodo se agrega a un padre sin ancestros
+    nodo = sg.SceneGraphNode("n" + str(profundidad - 1))
+    for i in range(profundidad - 2, -1, -1):
+        padre = sg.SceneGraphNode("n" + str(i))
+        padre.childs = [nodo]
+        nodo = padre
+    return nodo, "n" + str(profundidad - 1)
+
+def crearAncho(ancho):
+    # Raiz con ancho hijos
+    raiz = sg.SceneGraphNode("raiz")
+    raiz.childs = [sg.SceneGraphNode("n" + str(i)) for i in range(ancho)]
+    return raiz, "n" + str(ancho - 1)
+
+def crearEscenaNpcs(n, humano, zombie):
+    # Grafo como el de survival.py: n nodos trasladados y escalados, cada uno con una hoja
+    escena = sg.SceneGraphNode("npcs")
+    nodos = []
+    transformaciones = tr.matmulN([tr.translateN(np.full(n, 0.1), 0.2, 0), tr.uniformScale(0.08)])
+    for i in range(n):
+        nodo = sg.SceneGraphNode("npc" + str(i))
+        nodo.childs = [humano if i % 2 == 0 else zombie]
+        nodo.transform = transformaciones[i]
+        nodos.append(nodo)
+    escena.childs = nodos
+    return escena
+
+
+###################################################################################
+
+def benchTransformaciones(resultados, rapido):
+    resultados.append({"nombre": "tr.translate", "parametros": {},
+        **medir(lambda: tr.translate(0.1, 0.2, 0))})
+    a, b = tr.translate(0.1, 0.2, 0), tr.scale(0.08, 0.08, 1)
+    resultados.append({"nombre": "tr.matmul", "parametros": {"matrices": 2},
+        **medir(lambda: tr.matmul([a, b]))})
+    resultados.append({"nombre": "tr.translate+scale+matmul", "parametros": {},
+        **medir(lambda: tr.matmul([tr.translate(0.1, 0.2, 0), tr.scale(0.08, 0.08, 1)]))})
+
+    # Transformaciones de toda una poblacion: una por npc versus en lote
+    for n in [100, 1000, 10000]:
+        x, y, size = np.random.rand(n), np.random.rand(n), np.full(n, 0.08)
+        out = np.empty((n, 4, 4), dtype=np.float32)
+        resultados.append({"nombre": "tr.translate+scale+matmul por npc", "parametros": {"npcs": n},
+            **medir(lambda: [tr.matmul([tr.translate(x[i], y[i], 0), tr.scale(size[i], size[i], 1)]) for i in range(n)], 3)})
+        resultados.append({"nombre": "tr.translateN+scaleN+matmulN", "parametros": {"npcs": n},
+            **medir(lambda: tr.matmulN([tr.translateN(x, y, 0), tr.scaleN(size, size, 1)], out))})
+
+
+def benchCurvas(resultados, rapido):
+    for N in [3000, 6000]:
+        resultados.append({"nombre": "hermiteRand", "parametros": {"N": N}, **medir(lambda: hermiteRand(N))})
+        resultados.append({"nombre": "bezierRand", "parametros": {"N": N}, **medir(lambda: bezierRand(N))})
+
+
+def benchColisiones(resultados, rapido):
+    tamanos = [10, 100, 1000, 10000] if rapido else [10, 100, 1000, 10000, 100000]
+    for n in tamanos:
+        poblacion = crearMultitud(n)
+        lista = poblacion.vistas
+        humano = lista[0] # Los de indice par son humanos
+        # Jugador lejos de todos (la fuerza bruta recorre la lista completa y la grilla no
+        # entrega candidatos) y jugador en medio de la multitud, sobre un humano
+        lejos = Player(0.08)
+        lejos.pos = [10.0, 10.0]
+        cerca = Player(0.08)
+        cerca.pos = list(humano.posicion())
+        repeticiones = 3 if n >= 10000 else 5
+
+        grid = SpatialHash()
+        resultados.append({"nombre": "SpatialHash.rebuild", "parametros": {"npcs": n},
+            **medir(lambda: grid.rebuild(lista), repeticiones)})
+
+        for nombre, estructura in [("bruta", None), ("grilla", grid)]:
+            parametros = {"npcs": n, "estructura": nombre}
+            resultados.append({"nombre": "NPC.collision", "parametros": parametros,
+                **medir(lambda: humano.collision(lista, estructura), repeticiones)})
+            resultados.append({"nombre": "NPC.collisionI", "parametros": parametros,
+                **medir(lambda: humano.collisionI(lista, estructura), repeticiones)})
+            for jugador, player in [("lejos", lejos), ("multitud", cerca)]:
+                resultados.append({"nombre": "Player.collision", "parametros": {**parametros, "jugador": jugador},
+                    **medir(lambda: player.collision(lista, estructura), repeticiones)})
+
+
+def benchFindNode(resultados, rapido):
+    for tamano in [10, 100, 500]:
+        raiz, nombre = crearProfundo(tamano)
+        resultados.append({"nombre": "sg.findNode", "parametros": {"forma": "profundo", "nodos": tamano},
+            **medir(lambda: sg.findNode(raiz, nombre))})
+    for tamano in [10, 1000, 10000]:
+        raiz, nombre = crearAncho(tamano)
+        resultados.append({"nombre": "sg.findNode", "parametros": {"forma": "ancho", "nodos": tamano},
+            **medir(lambda: sg.findNode(raiz, nombre))})
+
+
+def benchDibujo(resultados, rapido):
+    # Se dibuja con un OpenGL que solo registra las llamadas, para medir el costo de CPU
+    # del recorrido sin contexto; se reportan tambien las llamadas de un recorrido
+    from shapes import createTextureGPUShape, createInstancedTextureGPUShape
+
+    with rgl.RecordingGL().install(rgl.DEFAULT_MODULES + ("shapes",)) as gl:
+        pipeline = es.SimpleTextureTransformShaderProgram()
+        humano = createTextureGPUShape(bs.createTextureQuad(1,1), pipeline, "sprites/humano.png")
+        zombie = createTextureGPUShape(bs.createTextureQuad(1,1), pipeline, "sprites/zombie.png")
+
+        for n in [10, 100, 1000] if rapido else [10, 100, 1000, 10000]:
+            escena = crearEscenaNpcs(n, humano, zombie)
+            tiempos = medir(lambda: sg.drawSceneGraphNode(escena, pipeline, "transform"), 3)
+            gl.reset()
+            sg.beginFrame()
+            sg.drawSceneGraphNode(escena, pipeline, "transform")
+            sg.beginFrame()
+            resultados.append({"nombre": "sg.drawSceneGraphNode", "parametros": {"npcs": n},
+                **tiempos, "gl": gl.counters(), "matmuls": sg.lastFrameMatmuls})
+
+            # El mismo recorrido cuando todos los nodos cambian su transformacion en cada frame
+            nodos = list(escena.childs)
+
+            def moverYDibujar():
+                for nodo in nodos:
+                    nodo.transform = nodo.transform
+                sg.drawSceneGraphNode(escena, pipeline, "transform")
+
+            resultados.append({"nombre": "sg.drawSceneGraphNode", "parametros": {"npcs": n, "todosCambian": True},
+                **medir(moverYDibujar, 3)})
+
+            # Los mismos dos casos con la escena compilada en una lista plana
+            sg.compileSceneGraphNode(escena)
+            resultados.append({"nombre": "sg.drawCompiledSceneGraphNode", "parametros": {"npcs": n},
+                **medir(lambda: sg.drawCompiledSceneGraphNode(escena, pipeline, "transform"), 3)})
+
+            def moverYDibujarCompilado():
+                for nodo in nodos:
+                    nodo.transform = nodo.transform
+                sg.drawCompiledSceneGraphNode(escena, pipeline, "transform")
+
+            resultados.append({"nombre": "sg.drawCompiledSceneGraphNode", "parametros": {"npcs": n, "todosCambian": True},
+                **medir(moverYDibujarCompilado, 3)})
+
+        # Los mismos npcs dibujados con instancias: se suben sus datos y se dibujan en un llamado
+        tex_instancias = es.SimpleInstancedTextureShaderProgram()
+        npcs = createInstancedTextureGPUShape(bs.createTextureQuad(1,1), tex_instancias,
+            ["humano", "zombie"], ta.TextureAtlas.fromDirectory("sprites"))
+        for n in [10, 100, 1000] if rapido else [10, 100, 1000, 10000]:
+            datos = np.random.rand(n, 4).astype(np.float32)
+
+            def dibujarInstancias():
+                npcs.fillInstances(datos)
+                tex_instancias.drawCall(npcs)
+
+            tiempos = medir(dibujarInstancias, 3)
+            gl.reset()
+            dibujarInstancias()
+            resultados.append({"nombre": "SimpleInstancedTextureShaderProgram.drawCall", "parametros": {"npcs": n},
+                **tiempos, "gl": gl.counters()})
+
+
+BENCHMARKS = {"transformaciones": benchTransformaciones, "curvas": benchCurvas,
+    "colisiones": benchColisiones, "findNode": benchFindNode, "dibujo": benchDibujo}
+
+
+def commitActual():
+    # Commit del repositorio, si se puede obtener
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Micro benchmarks de Beauchefville")
+    parser.add_argument("--salida", default=None, help="Archivo JSON de salida (por defecto, salida estandar)")
+    parser.add_argument("--rapido", action="store_true", help="Omite los tamanos mas grandes")
+    parser.add_argument("--solo", nargs="+", default=sorted(BENCHMARKS), choices=sorted(BENCHMARKS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    resultados = []
+    for nombre in args.solo:
+        print("Midiendo", nombre, file=sys.stderr)
+        BENCHMARKS[nombre](resultados, args.rapido)
+
+    reporte = {"commit": commitActual(), "python": platform.python_version(), "numpy": np.__version__,
+        "maquina": platform.platform(), "unidad": "segundos por llamada", "resultados": resultados}
+
+    if args.salida is None:
+        json.dump(reporte, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.salida, "w") as f:
+            json.dump(reporte, f, indent=2)
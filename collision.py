@@ -0,0 +1,195 @@
+""" Estructuras de aceleracion para la deteccion de colisiones entre npcs """
+
+import bisect
+import math
+
+
+class SpatialHash():
+    # Grilla uniforme (spatial hash) que agrupa a los npcs segun la celda en que se encuentran.
+    # Una colision solo puede ocurrir entre npcs que esten a menos de la suma de sus radios,
+    # por lo que basta revisar la celda del punto consultado y sus 8 vecinas.
+    def __init__(self, cellSize=0.1):
+        # El tamaño de la celda debe ser mayor o igual a la mayor suma de radios (0.04 + 0.04),
+        # con algo de holgura para que los npcs que avanzan durante el mismo tick sigan
+        # quedando en una celda vecina a la que fueron registrados
+        self.cellSize = cellSize
+        self.cells = {} # Diccionario (i, j) -> lista de npcs en esa celda
+        self.celdaDe = {} # Diccionario id(npc) -> celda en que fue registrado
+        self.chequeos = 0 # Cantidad total de candidatos entregados por las consultas
+
+    def celda(self, x, y):
+        # Se obtiene la celda que contiene al punto (x, y)
+        return (math.floor(x / self.cellSize), math.floor(y / self.cellSize))
+
+    def rebuild(self, npcs):
+        # Se vuelve a construir la grilla con las posiciones actuales de los npcs
+        self.cells = {}
+        self.celdaDe = {}
+        for npc in npcs:
+            self.insert(npc)
+
+    def insert(self, npc):
+        # Se registra un npc en la celda correspondiente a su posicion actual
+        x, y = npc.posicion()
+        key = self.celda(x, y)
+        if key in self.cells:
+            self.cells[key].append(npc)
+        else:
+            self.cells[key] = [npc]
+        self.celdaDe[id(npc)] = key
+
+    def remove(self, npc):
+        # Se quita un npc de la grilla (por ejemplo, cuando llega al final de su curva)
+        key = self.celdaDe.pop(id(npc), None)
+        if key is not None:
+            self.cells[key].remove(npc)
+            if not self.cells[key]:
+                del self.cells[key]
+
+    def query(self, x, y):
+        # Se retornan los npcs de la celda que contiene a (x, y) y de sus 8 vecinas
+        i, j = self.celda(x, y)
+        cercanos = []
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                celda = self.cells.get((i + di, j + dj))
+                if celda is not None:
+                    cercanos += celda
+        self.chequeos += len(cercanos)
+        return cercanos
+
+    def __len__(self):
+        return len(self.celdaDe)
+
+
+class SweepAndPrune():
+    # Barrido y poda (sweep and prune) a lo largo del eje vertical. Todas las curvas van de
+    # y=1 a y=-1, asi que los npcs se mantienen casi ordenados por y de un tick al siguiente:
+    # el orden se actualiza con insertion sort (casi lineal) y una consulta solo revisa los
+    # npcs cuyo intervalo en y se superpone con el del punto consultado.
+    # Tiene la misma interfaz que SpatialHash.
+    def __init__(self, margen=0.1):
+        # El margen debe ser mayor o igual a la mayor suma de radios, con la misma holgura que
+        # el tamaño de celda de SpatialHash
+        self.margen = margen
+        self.orden = [] # npcs ordenados por y
+        self.ys = [] # y de cada npc, en el mismo orden
+        self.miembros = {} # Diccionario id(npc) -> npc
+        self.chequeos = 0 # Cantidad total de candidatos entregados por las consultas
+
+    def rebuild(self, npcs):
+        # Se actualiza el orden con las posiciones actuales de los npcs
+        actuales = {id(npc): npc for npc in npcs}
+
+        # Se quitan los que ya no estan y se agregan al final los nuevos
+        if any(clave not in actuales for clave in self.miembros):
+            self.orden = [npc for npc in self.orden if id(npc) in actuales]
+        self.orden += [npc for npc in npcs if id(npc) not in self.miembros]
+        self.miembros = actuales
+
+        # Insertion sort por y: los npcs casi no cambian de orden entre ticks y los nuevos
+        # aparecen arriba (y=1), al final del orden
+        orden = self.orden
+        ys = [npc.posicion()[1] for npc in orden]
+        for i in range(1, len(ys)):
+            y = ys[i]
+            if ys[i - 1] <= y:
+                continue
+            npc = orden[i]
+            j = i - 1
+            while j >= 0 and ys[j] > y:
+                ys[j + 1] = ys[j]
+                orden[j + 1] = orden[j]
+                j -= 1
+            ys[j + 1] = y
+            orden[j + 1] = npc
+        self.ys = ys
+
+    def insert(self, npc):
+        # Se registra un npc en su lugar segun su y actual
+        y = npc.posicion()[1]
+        i = bisect.bisect_right(self.ys, y)
+        self.ys.insert(i, y)
+        self.orden.insert(i, npc)
+        self.miembros[id(npc)] = npc
+
+    def remove(self, npc):
+        # Se quita un npc; se busca a partir de la ultima y registrada
+        if self.miembros.pop(id(npc), None) is None:
+            return
+        i = bisect.bisect_left(self.ys, npc.posicion()[1])
+        if i >= len(self.orden) or self.orden[i] is not npc:
+            i = self.orden.index(npc)
+        del self.orden[i]
+        del self.ys[i]
+
+    def query(self, x, y):
+        # Se retornan los npcs cuya y esta a menos del margen de la consultada
+        inicio = bisect.bisect_left(self.ys, y - self.margen)
+        fin = bisect.bisect_right(self.ys, y + self.margen)
+        self.chequeos += fin - inicio
+        return self.orden[inicio:fin]
+
+    def __len__(self):
+        return len(self.orden)
+
+
+# Estructuras disponibles, por nombre (para elegirlas desde la linea de comandos)
+ESTRUCTURAS = {"grilla": SpatialHash, "sweep": SweepAndPrune}
+
+
+if __name__ == "__main__":
+
+    """
+    Benchmarks: fuerza bruta vs grilla vs sweep and prune
+    """
+
+    import time
+    from escenarios import crearPoblacion, crearMultitud
+
+    def tick(npcs, estructura=None):
+        if estructura is not None:
+            estructura.rebuild(npcs)
+        for a in npcs:
+            if a.eszombie == 0:
+                a.collision(npcs, estructura)
+                a.collisionI(npcs, estructura)
+
+    print("Densidad constante (un tick)")
+    print(f"{'N':>8} {'fuerza bruta [s]':>18} {'grilla [s]':>12} {'us/npc (grilla)':>16}")
+    for n in [100, 1000, 5000, 10000, 50000]:
+        npcs = crearPoblacion(n)
+
+        bruta = float("nan")
+        if n <= 5000:
+            t0 = time.perf_counter()
+            tick(npcs)
+            bruta = time.perf_counter() - t0
+
+        grid = SpatialHash()
+        t0 = time.perf_counter()
+        tick(npcs, grid)
+        grilla = time.perf_counter() - t0
+
+        print(f"{n:>8} {bruta:>18.4f} {grilla:>12.4f} {1e6 * grilla / n:>16.2f}")
+
+    print()
+    print("Multitud de arriba hacia abajo (promedio de 10 ticks)")
+    print(f"{'N':>8} {'fuerza bruta [s]':>18} {'grilla [s]':>12} {'sweep [s]':>12}")
+    for n in [100, 500, 1000, 2000]:
+        poblacion = crearMultitud(n)
+        tiempos = []
+        for estructura in [None, SpatialHash(), SweepAndPrune()]:
+            if estructura is None and n > 1000:
+                tiempos.append(float("nan"))
+                continue
+            t0 = time.perf_counter()
+            for k in range(10):
+                tick(poblacion.vistas, estructura)
+                poblacion.posA[:n] += 1
+                poblacion.actualizarPosiciones()
+            tiempos.append((time.perf_counter() - t0) / 10)
+            poblacion.posA[:n] -= 10
+            poblacion.actualizarPosiciones()
+
+        print(f"{n:>8} {tiempos[0]:>18.4f} {tiempos[1]:>12.4f} {tiempos[2]:>12.4f}")
@@ -0,0 +1,90 @@
+""" Biblioteca de curvas precalculadas en disco, compartida por memoria mapeada """
+
+import os
+import sys
+import numpy as np
+import grafica.ex_curves as cv
+from curves import randomMatrices
+
+
+# Cantidades de puntos para las que se generan curvas por defecto
+PUNTOS = tuple(range(3000, 6001, 500))
+
+
+def nombreArchivo(directorio, puntos, seed):
+    # Cada archivo guarda las curvas de una cantidad de puntos y una semilla
+    return os.path.join(directorio, "curvas_N" + str(puntos) + "_s" + str(seed) + ".npy")
+
+
+def generarArchivo(directorio, puntos, cantidad, seed):
+    # Se generan cantidad curvas aleatorias de puntos puntos y se guardan como (cantidad, puntos, 2) float32.
+    # La coordenada z no se usa, asi que no se guarda
+    rng = np.random.RandomState(seed * 100003 + puntos)
+    caminos = np.empty((cantidad, puntos, 2), dtype=np.float32)
+    lote = 64
+    for i in range(0, cantidad, lote):
+        k = min(lote, cantidad - i)
+        caminos[i:i + k] = cv.evalCurves(randomMatrices(k, rng), puntos)[:, :, 0:2]
+
+    # Se escribe a un archivo temporal y se renombra, para que otro proceso nunca lea un archivo a medias
+    archivo = nombreArchivo(directorio, puntos, seed)
+    temporal = archivo + "." + str(os.getpid()) + ".tmp"
+    with open(temporal, "wb") as f:
+        np.save(f, caminos)
+    os.replace(temporal, archivo)
+    return archivo
+
+
+class CurveBank():
+    # Banco de curvas precalculadas. Los archivos .npy se abren con memoria mapeada, de modo que
+    # varios procesos en la misma maquina comparten las mismas paginas, y cada npc recibe una vista
+    # (sin copia) de su camino. Elegir una curva es solo elegir un indice.
+    def __init__(self, directorio, seed=0, puntos=PUNTOS, cantidad=256):
+        self.directorio = directorio
+        self.seed = seed
+        self.puntos = tuple(puntos) # Cantidades de puntos disponibles
+        self.grupo = {N: g for g, N in enumerate(self.puntos)} # Cantidad de puntos -> indice del archivo
+        self.caminos = [] # Arreglo (cantidad, N, 2) de memoria mapeada por cada cantidad de puntos
+
+        os.makedirs(directorio, exist_ok=True)
+        for N in self.puntos:
+            archivo = nombreArchivo(directorio, N, seed)
+            if not os.path.exists(archivo):
+                generarArchivo(directorio, N, cantidad, seed)
+            self.caminos.append(np.load(archivo, mmap_mode="r"))
+
+    def elegir(self, k, rng=np.random):
+        # Se eligen k curvas al azar; se retornan sus cantidades de puntos y sus filas dentro del banco
+        grupos = rng.randint(0, len(self.puntos), k)
+        vels = np.array(self.puntos)[grupos]
+        filas = np.array([rng.randint(0, len(self.caminos[g])) for g in grupos], dtype=np.int64)
+        return vels, filas
+
+    def camino(self, puntos, fila):
+        # Vista (sin copia) del camino de una curva del banco, (puntos, 2)
+        return self.caminos[self.grupo[puntos]][fila]
+
+    def posiciones(self, vels, filas, posA):
+        # Se leen desde el banco las posiciones actuales de varios npcs, agrupados por archivo
+        x = np.empty(len(vels))
+        y = np.empty(len(vels))
+        for g, N in enumerate(self.puntos):
+            idx = np.flatnonzero(vels == N)
+            if len(idx) == 0:
+                continue
+            puntos = self.caminos[g][filas[idx], posA[idx]]
+            x[idx] = puntos[:, 0]
+            y[idx] = puntos[:, 1]
+        return x, y
+
+
+if __name__ == "__main__":
+
+    # Uso: python curve_bank.py <directorio> [seed] [cantidad]
+    directorio = sys.argv[1]
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    cantidad = int(sys.argv[3]) if len(sys.argv) > 3 else 256
+
+    os.makedirs(directorio, exist_ok=True)
+    for N in PUNTOS:
+        print(generarArchivo(directorio, N, cantidad, seed))
@@ -0,0 +1,101 @@
+""" Funciones para generar las curvas aleatorias que recorren los npcs """
+
+import numpy as np
+import grafica.ex_curves as cv
+from random import *
+
+
+def hermiteRandMatrix():
+    # Funcion para generar la matriz de una curva de Hermite aleatoria
+
+    # Puntos de Control
+    inicio = uniform(-0.5,0.5)
+    fin = uniform(-0.5,0.5)
+    x1 = uniform(-0.5,0.5)
+    x2 = uniform(-0.5,0.5)
+    y1 = uniform(-2.0,-1.0)
+    y2 = uniform(-2.0,-1.0)
+
+    P0 = np.array([[inicio, 1.0, 0]]).T
+    P1 = np.array([[fin, -1.0, 0]]).T
+    T0 = np.array([[x1, y1, 0]]).T
+    T1 = np.array([[x2, y2, 0]]).T
+    # Matriz de Hermite
+    return cv.hermiteMatrix(P0, P1, T0, T1)
+
+def bezierRandMatrix():
+    # Funcion para generar la matriz de una curva de Bezier aleatoria
+
+    # Puntos de Control
+    inicio = uniform(-0.5,0.5)
+    fin = uniform(-0.5,0.5)
+    x1 = uniform(-0.5,0.5)
+    x2 = uniform(-0.5,0.5)
+    y1 = uniform(-1.0,1.0)
+    y2 = uniform(-1.0,1.0)
+
+    P0 = np.array([[inicio, 1.0, 0]]).T
+    P1 = np.array([[x1, y1, 0]]).T
+    P2 = np.array([[x2, y2, 0]]).T
+    P3 = np.array([[fin, -1.0, 0]]).T
+    # Matriz de Bezier
+    return cv.bezierMatrix(P0, P1, P2, P3)
+
+
+def hermiteRand(N, out=None):
+    # Funcion para generar una curva de Hermite de N puntos
+    # Si se entrega out (arreglo de al menos N filas), la curva se escribe ahi
+    return cv.evalCurve(hermiteRandMatrix(), N, out)
+
+def bezierRand(N, out=None):
+    # Funcion para generar una curva de Bezier de N puntos
+    # Si se entrega out (arreglo de al menos N filas), la curva se escribe ahi
+    return cv.evalCurve(bezierRandMatrix(), N, out)
+
+
+def randomCurvaMatrix():
+    # Funcion que crea aleatoriamente la matriz de una curva de Hermite o de Bezier
+    a = randint(0,1)
+    if a == 1:
+        return bezierRandMatrix()
+    return hermiteRandMatrix()
+
+
+def randomCurva(v, out=None):
+    # Funcion que crea aleatoriamente una curva de Hermite o de Bezier con v puntos
+    a = randint(0,1)
+    curva = []
+    if a == 1:
+        curva = bezierRand(v, out)
+    else:
+        curva = hermiteRand(v, out)
+    return curva
+
+###################################################################################
+
+def hermiteRandMatrices(K, rng=np.random):
+    # Funcion para generar las matrices de K curvas de Hermite aleatorias, (K, 3, 4)
+    ceros = np.zeros(K)
+    P0 = np.stack((rng.uniform(-0.5, 0.5, K), np.ones(K), ceros), axis=1)
+    P1 = np.stack((rng.uniform(-0.5, 0.5, K), -np.ones(K), ceros), axis=1)
+    T0 = np.stack((rng.uniform(-0.5, 0.5, K), rng.uniform(-2.0, -1.0, K), ceros), axis=1)
+    T1 = np.stack((rng.uniform(-0.5, 0.5, K), rng.uniform(-2.0, -1.0, K), ceros), axis=1)
+    return cv.hermiteMatrices(P0, P1, T0, T1)
+
+def bezierRandMatrices(K, rng=np.random):
+    # Funcion para generar las matrices de K curvas de Bezier aleatorias, (K, 3, 4)
+    ceros = np.zeros(K)
+    P0 = np.stack((rng.uniform(-0.5, 0.5, K), np.ones(K), ceros), axis=1)
+    P1 = np.stack((rng.uniform(-0.5, 0.5, K), rng.uniform(-1.0, 1.0, K), ceros), axis=1)
+    P2 = np.stack((rng.uniform(-0.5, 0.5, K), rng.uniform(-1.0, 1.0, K), ceros), axis=1)
+    P3 = np.stack((rng.uniform(-0.5, 0.5, K), -np.ones(K), ceros), axis=1)
+    return cv.bezierMatrices(P0, P1, P2, P3)
+
+def randomMatrices(K, rng=np.random):
+    # Funcion que crea las matrices de K curvas, cada una de Hermite o de Bezier al azar
+    esBezier = rng.randint(0, 2, K) == 1
+    return np.where(esBezier[:, None, None], bezierRandMatrices(K, rng), hermiteRandMatrices(K, rng))
+
+def randomCurvas(K, N, rng=np.random):
+    # Funcion que crea una oleada de K curvas aleatorias de N puntos, (K, N, 3)
+    return cv.evalCurves(randomMatrices(K, rng), N)
@@ -0,0 +1,39 @@
+""" Poblaciones de npcs de prueba, compartidas por los benchmarks y los tests """
+
+import math
+import random
+import numpy as np
+from model import NPC
+from population import Population
+from curves import randomMatrices
+
+
+def crearPoblacion(n, densidad=500.0):
+    # Se reparten n npcs quietos en un cuadrado cuya area crece con n, manteniendo la densidad.
+    # La mitad son zombies y un sexto de los npcs esta infectado
+    lado = math.sqrt(n / densidad)
+    npcs = []
+    for k in range(n):
+        npc = NPC(0, 1, 0.08, k % 2)
+        npc.infectado = int(k % 3 == 0 and k % 2 == 0)
+        npc.nombre = str(k)
+        # Curva constante: el npc se queda en un punto al azar
+        npc.curva = np.zeros((3, 4))
+        npc.curva[0][0] = random.uniform(-lado, lado)
+        npc.curva[1][0] = random.uniform(-lado, lado)
+        npcs.append(npc)
+    return npcs
+
+
+def crearMultitud(n):
+    # Poblacion de n npcs ya repartidos a lo largo de sus curvas, bajando de y=1 a y=-1.
+    # La mitad son zombies y un sexto de los npcs esta infectado
+    poblacion = Population(capacidad=max(n, 1))
+    eszombie = np.arange(n) % 2
+    infectado = (np.arange(n) % 6 == 0).astype(np.int8)
+    poblacion.agregarLote(randomMatrices(n), np.random.randint(3000, 6001, n), eszombie, infectado,
+        nombres=[str(k) for k in range(n)])
+    poblacion.posA[:n] = np.random.randint(0, 3000, n)
+    poblacion.posS[:n] = poblacion.posA[:n] + 1
+    poblacion.actualizarPosiciones()
+    return poblacion
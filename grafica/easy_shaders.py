@@ -7,7 +7,9 @@ import numpy as np
 from PIL import Image
 
 import grafica.basic_shapes as bs
-from grafica.gpu_shape import GPUShape
+import grafica.gl_state as gls
+import grafica.program_cache as pc
+from grafica.gpu_shape import GPUShape, InstancedGPUShape, DynamicGPUShape
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
@@ -21,7 +23,7 @@ def textureSimpleSetup(imgName, sWrapMode, tWrapMode, minFilterMode, maxFilterMo
      # wrapMode: GL_REPEAT, GL_CLAMP_TO_EDGE
      # filterMode: GL_LINEAR, GL_NEAREST
     texture = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, texture)
+    gls.state.bindTexture(texture)
     
     # texture wrapping params
     glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, sWrapMode)
@@ -78,14 +80,13 @@ class SimpleShaderProgram:
             }
             """
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
+        self.shaderProgram = pc.compileProgram(vertex_shader, fragment_shader)
+        gls.state.resolveUniforms(self.shaderProgram)
 
 
     def setupVAO(self, gpuShape):
 
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
 
         glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
@@ -100,19 +101,16 @@ class SimpleShaderProgram:
         glEnableVertexAttribArray(color)
 
         # Unbinding current vao
-        glBindVertexArray(0)
+        gls.state.bindVertexArray(0)
 
 
     def drawCall(self, gpuShape, mode=GL_TRIANGLES):
         assert isinstance(gpuShape, GPUShape)
 
         # Binding the VAO and executing the draw call
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
 
-        # Unbind the current VAO
-        glBindVertexArray(0)
-
 
 class SimpleTextureShaderProgram:
 
@@ -148,12 +146,11 @@ class SimpleTextureShaderProgram:
             }
             """
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
+        self.shaderProgram = pc.compileProgram(vertex_shader, fragment_shader)
+        gls.state.resolveUniforms(self.shaderProgram)
 
     def setupVAO(self, gpuShape):
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
 
         glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
@@ -168,19 +165,16 @@ class SimpleTextureShaderProgram:
         glEnableVertexAttribArray(texCoords)
 
         # Unbinding current vao
-        glBindVertexArray(0)
+        gls.state.bindVertexArray(0)
 
 
     def drawCall(self, gpuShape, mode=GL_TRIANGLES):
         assert isinstance(gpuShape, GPUShape)
 
         # Binding the VAO and executing the draw call
-        glBindVertexArray(gpuShape.vao)
-        glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
+        gls.state.bindVertexArray(gpuShape.vao)
+        gls.state.bindTexture(gpuShape.texture)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
-        
-        # Unbind the current VAO
-        glBindVertexArray(0)
 
 
 class SimpleTransformShaderProgram:
@@ -216,12 +210,11 @@ class SimpleTransformShaderProgram:
             }
             """
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.shaderProgram = pc.compileProgram(vertex_shader, fragment_shader)
+        gls.state.resolveUniforms(self.shaderProgram)
 
     def setupVAO(self, gpuShape):
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
 
         glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
@@ -236,21 +229,22 @@ class SimpleTransformShaderProgram:
         glEnableVertexAttribArray(color)
 
         # Unbinding current vao
-        glBindVertexArray(0)
+        gls.state.bindVertexArray(0)
 
 
     def drawCall(self, gpuShape, mode=GL_TRIANGLES):
         assert isinstance(gpuShape, GPUShape)
 
         # Binding the VAO and executing the draw call
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
-        
-        # Unbind the current VAO
-        glBindVertexArray(0)
 
 
 class SimpleTextureTransformShaderProgram:
+    """
+    Textured shapes with a transform. The tint uniform (rgba) multiplies the
+    texture color, so one program covers plain, tinted and fading sprites.
+    """
 
     def __init__(self):
 
@@ -279,22 +273,31 @@ class SimpleTextureTransformShaderProgram:
             out vec4 outColor;
 
             uniform sampler2D samplerTex;
+            uniform vec4 tint;
 
             void main()
             {
-                outColor = texture(samplerTex, outTexCoords);
+                outColor = texture(samplerTex, outTexCoords) * tint;
             }
             """
 
         # Compiling our shader program
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
+        self.shaderProgram = pc.compileProgram(vertex_shader, fragment_shader)
+        gls.state.resolveUniforms(self.shaderProgram)
+
+        # No tint by default
+        gls.state.useProgram(self.shaderProgram)
+        self.setTint(1.0, 1.0, 1.0, 1.0)
+
+
+    def setTint(self, r, g, b, a):
+        # The program must be in use
+        glUniform4f(gls.state.uniformLocation(self.shaderProgram, "tint"), r, g, b, a)
 
 
     def setupVAO(self, gpuShape):
 
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
 
         glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
@@ -309,18 +312,205 @@ class SimpleTextureTransformShaderProgram:
         glEnableVertexAttribArray(texCoords)
 
         # Unbinding current vao
-        glBindVertexArray(0)
+        gls.state.bindVertexArray(0)
 
 
     def drawCall(self, gpuShape, mode=GL_TRIANGLES):
         assert isinstance(gpuShape, GPUShape)
 
-        glBindVertexArray(gpuShape.vao)
-        glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
+        gls.state.bindVertexArray(gpuShape.vao)
+        gls.state.bindTexture(gpuShape.texture)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
 
-        # Unbind the current VAO
-        glBindVertexArray(0)
+
+class SimpleInstancedTextureShaderProgram:
+    """
+    Draws every instance of an InstancedGPUShape with one glDrawElementsInstanced call.
+    Each instance has 4 floats: x, y, scale and sprite id, selecting one of the
+    atlas regions of the shape (at most MAX_SPRITES). The tint uniform multiplies the color.
+    """
+
+    # Size of the uniform array of atlas regions
+    MAX_SPRITES = 8
+
+    def __init__(self):
+
+        vertex_shader = """
+            #version 130
+
+            uniform mat4 transform;
+            uniform vec4 regions[%d];
+
+            in vec3 position;
+            in vec2 texCoords;
+            in vec4 instance;
+
+            out vec2 outTexCoords;
+
+            void main()
+            {
+                vec3 worldPosition = vec3(instance.z * position.xy + instance.xy, position.z);
+                gl_Position = transform * vec4(worldPosition, 1.0f);
+
+                // Texture coordinates in [0, 1] are moved into the atlas region of the sprite
+                vec4 region = regions[int(instance.w + 0.5f)];
+                outTexCoords = mix(region.xy, region.zw, texCoords);
+            }
+            """ % self.MAX_SPRITES
+
+        fragment_shader = """
+            #version 130
+
+            in vec2 outTexCoords;
+
+            out vec4 outColor;
+
+            uniform sampler2D samplerTex;
+            uniform vec4 tint;
+
+            void main()
+            {
+                outColor = texture(samplerTex, outTexCoords) * tint;
+            }
+            """
+
+        # Compiling our shader program
+        self.shaderProgram = pc.compileProgram(vertex_shader, fragment_shader)
+        gls.state.resolveUniforms(self.shaderProgram)
+
+        # The sampler reads from texture unit 0, no tint by default
+        gls.state.useProgram(self.shaderProgram)
+        glUniform1i(gls.state.uniformLocation(self.shaderProgram, "samplerTex"), 0)
+        glUniformMatrix4fv(gls.state.uniformLocation(self.shaderProgram, "transform"), 1, GL_TRUE, np.identity(4, dtype=np.float32))
+        self.setTint(1.0, 1.0, 1.0, 1.0)
+
+
+    def setTint(self, r, g, b, a):
+        # The program must be in use
+        glUniform4f(gls.state.uniformLocation(self.shaderProgram, "tint"), r, g, b, a)
+
+
+    def setupVAO(self, gpuShape):
+        assert isinstance(gpuShape, InstancedGPUShape)
+
+        gls.state.bindVertexArray(gpuShape.vao)
+
+        glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
+
+        # 3d vertices + 2d texture coordinates => 3*4 + 2*4 = 20 bytes
+        position = glGetAttribLocation(self.shaderProgram, "position")
+        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(position)
+        
+        texCoords = glGetAttribLocation(self.shaderProgram, "texCoords")
+        glVertexAttribPointer(texCoords, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(3 * SIZE_IN_BYTES))
+        glEnableVertexAttribArray(texCoords)
+
+        # x, y, scale, sprite id => 4*4 = 16 bytes per instance, advancing once per instance
+        glBindBuffer(GL_ARRAY_BUFFER, gpuShape.instanceVbo)
+        instance = glGetAttribLocation(self.shaderProgram, "instance")
+        glVertexAttribPointer(instance, 4, GL_FLOAT, GL_FALSE, 16, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(instance)
+        glVertexAttribDivisor(instance, 1)
+
+        # Unbinding current vao
+        gls.state.bindVertexArray(0)
+
+
+    def drawCall(self, gpuShape, mode=GL_TRIANGLES):
+        assert isinstance(gpuShape, InstancedGPUShape)
+
+        if gpuShape.instanceCount == 0:
+            return
+
+        # The program must be in use
+        glUniform4fv(gls.state.uniformLocation(self.shaderProgram, "regions"), len(gpuShape.regions), gpuShape.regions)
+        gls.state.bindTexture(gpuShape.texture)
+
+        gls.state.bindVertexArray(gpuShape.vao)
+        glDrawElementsInstanced(mode, gpuShape.size, GL_UNSIGNED_INT, None, gpuShape.instanceCount)
+
+
+class SpriteBatchShaderProgram:
+    """
+    Pipeline of the SpriteBatch: textured vertices with their own color,
+    (x, y, z, s, t, r, g, b, a). The texture color is multiplied by the vertex color.
+    """
+
+    def __init__(self):
+
+        vertex_shader = """
+            #version 130
+
+            uniform mat4 transform;
+
+            in vec3 position;
+            in vec2 texCoords;
+            in vec4 color;
+
+            out vec2 outTexCoords;
+            out vec4 outColor;
+
+            void main()
+            {
+                gl_Position = transform * vec4(position, 1.0f);
+                outTexCoords = texCoords;
+                outColor = color;
+            }
+            """
+
+        fragment_shader = """
+            #version 130
+
+            in vec2 outTexCoords;
+            in vec4 outColor;
+
+            out vec4 fragColor;
+
+            uniform sampler2D samplerTex;
+
+            void main()
+            {
+                fragColor = texture(samplerTex, outTexCoords) * outColor;
+            }
+            """
+
+        # Compiling our shader program
+        self.shaderProgram = pc.compileProgram(vertex_shader, fragment_shader)
+        gls.state.resolveUniforms(self.shaderProgram)
+
+
+    def setupVAO(self, gpuShape):
+
+        gls.state.bindVertexArray(gpuShape.vao)
+
+        glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
+
+        # 3d vertices + 2d texture coordinates + rgba color => 3*4 + 2*4 + 4*4 = 36 bytes
+        position = glGetAttribLocation(self.shaderProgram, "position")
+        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(position)
+        
+        texCoords = glGetAttribLocation(self.shaderProgram, "texCoords")
+        glVertexAttribPointer(texCoords, 2, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(3 * SIZE_IN_BYTES))
+        glEnableVertexAttribArray(texCoords)
+
+        color = glGetAttribLocation(self.shaderProgram, "color")
+        glVertexAttribPointer(color, 4, GL_FLOAT, GL_FALSE, 36, ctypes.c_void_p(5 * SIZE_IN_BYTES))
+        glEnableVertexAttribArray(color)
+
+        # Unbinding current vao
+        gls.state.bindVertexArray(0)
+
+
+    def drawCall(self, gpuShape, mode=GL_TRIANGLES):
+        assert isinstance(gpuShape, GPUShape)
+
+        gls.state.bindVertexArray(gpuShape.vao)
+        gls.state.bindTexture(gpuShape.texture)
+        glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
 
 
 class SimpleModelViewProjectionShaderProgram:
@@ -356,14 +546,13 @@ class SimpleModelViewProjectionShaderProgram:
             }
             """
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.shaderProgram = pc.compileProgram(vertex_shader, fragment_shader)
+        gls.state.resolveUniforms(self.shaderProgram)
 
 
     def setupVAO(self, gpuShape):
 
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
 
         glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
@@ -378,19 +567,16 @@ class SimpleModelViewProjectionShaderProgram:
         glEnableVertexAttribArray(color)
 
         # Unbinding current vao
-        glBindVertexArray(0)
+        gls.state.bindVertexArray(0)
 
 
     def drawCall(self, gpuShape, mode=GL_TRIANGLES):
         assert isinstance(gpuShape, GPUShape)
 
         # Binding the VAO and executing the draw call
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
 
-        # Unbind the current VAO
-        glBindVertexArray(0)
-
 
 class SimpleTextureModelViewProjectionShaderProgram:
 
@@ -430,14 +616,13 @@ class SimpleTextureModelViewProjectionShaderProgram:
             }
             """
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.shaderProgram = pc.compileProgram(vertex_shader, fragment_shader)
+        gls.state.resolveUniforms(self.shaderProgram)
 
 
     def setupVAO(self, gpuShape):
 
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
 
         glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
@@ -452,18 +637,15 @@ class SimpleTextureModelViewProjectionShaderProgram:
         glEnableVertexAttribArray(texCoords)
 
         # Unbinding current vao
-        glBindVertexArray(0)
+        gls.state.bindVertexArray(0)
 
 
     def drawCall(self, gpuShape, mode=GL_TRIANGLES):
         assert isinstance(gpuShape, GPUShape)
 
         # Binding the VAO and executing the draw call
-        glBindVertexArray(gpuShape.vao)
-        glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
+        gls.state.bindVertexArray(gpuShape.vao)
+        gls.state.bindTexture(gpuShape.texture)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
 
-        # Unbind the current VAO
-        glBindVertexArray(0)
-
 
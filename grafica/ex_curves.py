@@ -1,9 +1,8 @@
 # coding=utf-8
 """Hermite and Bezier curves using python, numpy and matplotlib"""
 
+import functools
 import numpy as np
-import matplotlib.pyplot as mpl
-from mpl_toolkits.mplot3d import Axes3D
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
@@ -35,6 +34,30 @@ def bezierMatrix(P0, P1, P2, P3):
     return np.matmul(G, Mb)
 
 
+def hermiteMatrices(P1s, P2s, T1s, T2s):
+    
+    # Batched version of hermiteMatrix: each argument is a (K, 3) array of points,
+    # the result is a (K, 3, 4) stack of curve matrices
+    G = np.stack((P1s, P2s, T1s, T2s), axis=2)
+
+    # Hermite base matrix is a constant
+    Mh = np.array([[1, 0, -3, 2], [0, 0, 3, -2], [0, 1, -2, 1], [0, 0, -1, 1]])
+
+    return np.matmul(G, Mh)
+
+
+def bezierMatrices(P0s, P1s, P2s, P3s):
+
+    # Batched version of bezierMatrix: each argument is a (K, 3) array of points,
+    # the result is a (K, 3, 4) stack of curve matrices
+    G = np.stack((P0s, P1s, P2s, P3s), axis=2)
+
+    # Bezier base matrix is a constant
+    Mb = np.array([[1, -3, 3, -1], [0, 3, -6, 3], [0, 0, 3, -3], [0, 0, 0, 1]])
+
+    return np.matmul(G, Mb)
+
+
 def plotCurve(ax, curve, label, color=(0,0,1)):
     
     xs = curve[:, 0]
@@ -44,21 +67,47 @@ def plotCurve(ax, curve, label, color=(0,0,1)):
     ax.plot(xs, ys, zs, label=label, color=color)
     
 
-# M is the cubic curve matrix, N is the number of samples between 0 and 1
-def evalCurve(M, N):
-    # The parameter t should move between 0 and 1
+# Number of power basis tables kept; callers sampling many different N
+# (e.g. one per npc speed) only keep the most recently used ones
+BASIS_CACHE_SIZE = 32
+
+
+@functools.lru_cache(maxsize=BASIS_CACHE_SIZE)
+def powerBasis(N):
+    """
+    Returns a (4, N) table whose columns are generateT(t) for N samples of t between 0 and 1.
+    The latest tables are cached per N and must not be modified.
+    """
     ts = np.linspace(0.0, 1.0, N)
-    
-    # The computed value in R3 for each sample will be stored here
-    curve = np.ndarray(shape=(N, 3), dtype=float)
-    
-    for i in range(len(ts)):
-        T = generateT(ts[i])
-        curve[i, 0:3] = np.matmul(M, T).T
+    basis = np.stack((np.ones(N), ts, ts**2, ts**3))
+    basis.flags.writeable = False
+    return basis
+
+
+# M is the cubic curve matrix, N is the number of samples between 0 and 1
+def evalCurve(M, N, out=None):
+    # All samples are computed at once as M times the power basis table.
+    # If out is given (at least N rows), the curve is written there
+    if out is None:
+        curve = np.ndarray(shape=(N, 3), dtype=float)
+    else:
+        curve = out[:N]
+
+    curve[:, 0:3] = np.matmul(M, powerBasis(N)).T
         
     return curve
 
+
+# Ms is a stack of K cubic curve matrices (K, 3, 4), N is the number of samples between 0 and 1
+def evalCurves(Ms, N):
+    # The K curves are computed at once, returning a (K, N, 3) array
+    return np.matmul(Ms, powerBasis(N)).transpose(0, 2, 1)
+
+
 if __name__ == "__main__":
+
+    import matplotlib.pyplot as mpl
+    from mpl_toolkits.mplot3d import Axes3D
     
     """
     Example for Hermite curve
@@ -0,0 +1,141 @@
+# coding=utf-8
+"""Frame timeline export in the Chrome trace event format (chrome://tracing, Perfetto)"""
+
+import gc
+import json
+import queue
+import threading
+import time
+
+
+class FrameTrace:
+    """
+    Streams trace events to disk while the application runs.
+
+    Events are kept in a small buffer; when it holds maxBuffered events it is
+    handed to a background thread that appends them to the file, so the frame
+    loop never waits on disk. At most maxQueued buffers wait for the writer:
+    if the disk falls that far behind, new buffers are dropped (and counted in
+    dropped) instead of blocking the frame, so memory stays bounded on long sessions.
+
+    If the path ends with ".jsonl" one event per line is written; otherwise a
+    JSON array that chrome://tracing and Perfetto load directly.
+    Garbage collector pauses are recorded through gc.callbacks.
+    """
+
+    def __init__(self, path, maxBuffered=1024, maxQueued=64, traceGC=True):
+        self.path = path
+        self.jsonLines = path.endswith(".jsonl")
+        self.maxBuffered = maxBuffered
+        self.buffer = []
+        self.origin = time.perf_counter()
+        self.pid = 1
+        self.tid = 1
+        self.written = 0
+        self.dropped = 0
+        self.gcStart = None
+        self.owner = threading.get_ident()
+
+        self.file = open(path, "w")
+        if not self.jsonLines:
+            self.file.write("[\n")
+
+        self.queue = queue.Queue(maxsize=maxQueued)
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+        self.traceGC = traceGC
+        if traceGC:
+            gc.callbacks.append(self._onGC)
+
+    def _microseconds(self, seconds):
+        return (seconds - self.origin) * 1e6
+
+    def _add(self, event):
+        self.buffer.append(event)
+        if len(self.buffer) >= self.maxBuffered:
+            self.flush()
+
+    def complete(self, name, start, duration, category="frame", args=None):
+        """
+        Span that started at start (time.perf_counter seconds) and lasted duration seconds
+        """
+        event = {"name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": self.tid,
+            "ts": self._microseconds(start), "dur": duration * 1e6}
+        if args is not None:
+            event["args"] = args
+        self._add(event)
+
+    def instant(self, name, category="event", args=None):
+        """
+        Point in time event, stamped now
+        """
+        event = {"name": name, "cat": category, "ph": "i", "s": "g", "pid": self.pid, "tid": self.tid,
+            "ts": self._microseconds(time.perf_counter())}
+        if args is not None:
+            event["args"] = args
+        self._add(event)
+
+    def _onGC(self, phase, info):
+        # Collections triggered by the writer thread are ignored, so the buffer is only used from one thread
+        if threading.get_ident() != self.owner:
+            return
+        if phase == "start":
+            self.gcStart = time.perf_counter()
+        elif self.gcStart is not None:
+            self.complete("gc gen " + str(info["generation"]), self.gcStart,
+                time.perf_counter() - self.gcStart, "gc", {"collected": info["collected"]})
+            self.gcStart = None
+
+    def flush(self):
+        """
+        Hands the buffered events to the writer thread
+        """
+        if self.buffer:
+            try:
+                self.queue.put_nowait(self.buffer)
+            except queue.Full:
+                self.dropped += len(self.buffer)
+            self.buffer = []
+
+    def _write(self):
+        while True:
+            events = self.queue.get()
+            if events is None:
+                break
+            lines = []
+            for event in events:
+                text = json.dumps(event)
+                if self.jsonLines:
+                    lines.append(text + "\n")
+                else:
+                    lines.append((",\n" if self.written > 0 else "") + text)
+                self.written += 1
+            self.file.write("".join(lines))
+            self.file.flush()
+
+    def close(self):
+        """
+        Writes the pending events and closes the file
+        """
+        if self.traceGC:
+            gc.callbacks.remove(self._onGC)
+            self.traceGC = False
+        # The last buffer is always written, waiting for the writer if needed
+        if self.buffer:
+            self.queue.put(self.buffer)
+            self.buffer = []
+        if self.dropped > 0:
+            self.queue.put([{"name": "dropped events", "cat": "trace", "ph": "i", "s": "g", "pid": self.pid,
+                "tid": self.tid, "ts": self._microseconds(time.perf_counter()), "args": {"dropped": self.dropped}}])
+        self.queue.put(None)
+        self.thread.join()
+        if not self.jsonLines:
+            self.file.write("\n]\n")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,171 @@
+# coding=utf-8
+"""Cache of the bound OpenGL state, to skip redundant binds and uniform location queries"""
+
+from OpenGL.GL import *
+
+
+class GLStateCache:
+    """
+    Remembers the current program, VAO, active texture unit and bound textures,
+    so binding what is already bound does not reach the driver. It also keeps
+    the uniform locations and declared types of every program, resolved once after linking.
+
+    All binds must go through the cache (or invalidate() must be called after
+    binding something directly), otherwise the cached state becomes stale.
+    Programs, VAOs and textures must also be deleted through it: GL reuses the
+    names of deleted objects, and a new object with a remembered name would
+    have its first bind skipped.
+
+    Counters: issued and elided calls of the current frame, by kind.
+    beginFrame() stores them in lastFrameIssued and lastFrameElided and resets them.
+    """
+
+    def __init__(self):
+        self.locations = {}
+        self.types = {}
+        self.lastFrameIssued = {}
+        self.lastFrameElided = {}
+        self.invalidate()
+        self.resetCounters()
+
+    def invalidate(self):
+        """
+        Forgets the cached bindings, e.g. after a new context or external GL calls.
+        Uniform locations and types are kept, they only depend on the program.
+        """
+        self.program = None
+        self.vao = None
+        self.activeUnit = None
+        self.textures = {}
+
+    def resetCounters(self):
+        self.issued = {"useProgram": 0, "bindVertexArray": 0, "activeTexture": 0,
+            "bindTexture": 0, "getUniformLocation": 0}
+        self.elided = dict.fromkeys(self.issued, 0)
+
+    def beginFrame(self):
+        """
+        It must be called once per frame to keep the per frame counters
+        """
+        self.lastFrameIssued = self.issued
+        self.lastFrameElided = self.elided
+        self.resetCounters()
+
+    def elidedLastFrame(self):
+        return sum(self.lastFrameElided.values())
+
+    def useProgram(self, program):
+        if program == self.program:
+            self.elided["useProgram"] += 1
+            return
+        glUseProgram(program)
+        self.program = program
+        self.issued["useProgram"] += 1
+
+    def bindVertexArray(self, vao):
+        if vao == self.vao:
+            self.elided["bindVertexArray"] += 1
+            return
+        glBindVertexArray(vao)
+        self.vao = vao
+        self.issued["bindVertexArray"] += 1
+
+    def activeTexture(self, unit):
+        """
+        unit is the texture unit index: 0, 1, ...
+        """
+        if unit == self.activeUnit:
+            self.elided["activeTexture"] += 1
+            return
+        glActiveTexture(GL_TEXTURE0 + unit)
+        self.activeUnit = unit
+        self.issued["activeTexture"] += 1
+
+    def bindTexture(self, texture, unit=0, target=GL_TEXTURE_2D):
+        """
+        Binds texture to the given texture unit
+        """
+        if self.textures.get(unit) == texture:
+            self.elided["bindTexture"] += 1
+            return
+        self.activeTexture(unit)
+        glBindTexture(target, texture)
+        self.textures[unit] = texture
+        self.issued["bindTexture"] += 1
+
+    def deleteProgram(self, program):
+        """
+        Deletes a program and forgets its binding, uniform locations and types
+        """
+        glDeleteProgram(program)
+        if self.program == program:
+            self.program = None
+        self.locations.pop(program, None)
+        self.types.pop(program, None)
+
+    def deleteVertexArray(self, vao):
+        """
+        Deletes a VAO and forgets its binding
+        """
+        glDeleteVertexArrays(1, [vao])
+        if self.vao == vao:
+            self.vao = None
+
+    def deleteTexture(self, texture):
+        """
+        Deletes a texture and forgets the units it was bound to
+        """
+        glDeleteTextures(1, [texture])
+        for unit, bound in list(self.textures.items()):
+            if bound == texture:
+                del self.textures[unit]
+
+    def resolveUniforms(self, program):
+        """
+        Queries once the locations and types of every active uniform of a linked program
+        """
+        locations = self.locations.setdefault(program, {})
+        types = self.types.setdefault(program, {})
+        count = int(glGetProgramiv(program, GL_ACTIVE_UNIFORMS))
+        for i in range(count):
+            name, size, kind = glGetActiveUniform(program, i)
+            if isinstance(name, bytes):
+                name = name.decode()
+            # Arrays are reported as "name[0]"
+            if name.endswith("[0]"):
+                name = name[:-3]
+            locations[name] = glGetUniformLocation(program, name)
+            types[name] = kind
+        return locations
+
+    def uniformType(self, program, name):
+        """
+        Declared type of an active uniform (GL_FLOAT_VEC4, GL_SAMPLER_2D, ...),
+        or None if the program has no active uniform with that name
+        """
+        types = self.types.get(program)
+        if types is None:
+            self.resolveUniforms(program)
+            types = self.types[program]
+        return types.get(name)
+
+    def uniformLocation(self, program, name):
+        """
+        Location of a uniform, from the cache when already known
+        """
+        locations = self.locations.get(program)
+        if locations is not None:
+            location = locations.get(name)
+            if location is not None:
+                self.elided["getUniformLocation"] += 1
+                return location
+        else:
+            locations = self.locations[program] = {}
+        location = glGetUniformLocation(program, name)
+        locations[name] = location
+        self.issued["getUniformLocation"] += 1
+        return location
+
+
+# State shared by every pipeline and drawing function of the application
+state = GLStateCache()
@@ -4,6 +4,7 @@
 #import OpenGL.GL as ogl
 from OpenGL.GL import *
 import numpy as np
+import grafica.gl_state as gls
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
@@ -48,6 +49,9 @@ class GPUShape:
 
         self.size = len(indices)
 
+        # The element buffer binding is part of the bound VAO, so none must be bound here
+        gls.state.bindVertexArray(0)
+
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
         glBufferData(GL_ARRAY_BUFFER, len(vertexData) * SIZE_IN_BYTES, vertexData, usage)
 
@@ -58,7 +62,7 @@ class GPUShape:
         """Freeing GPU memory"""
 
         if self.texture != None:
-            glDeleteTextures(1, [self.texture])
+            gls.state.deleteTexture(self.texture)
         
         if self.ebo != None:
             glDeleteBuffers(1, [self.ebo])
@@ -67,5 +71,80 @@ class GPUShape:
             glDeleteBuffers(1, [self.vbo])
 
         if self.vao != None:
-            glDeleteVertexArrays(1, [self.vao])
-        
\ No newline at end of file
+            gls.state.deleteVertexArray(self.vao)
+        
+
+class InstancedGPUShape(GPUShape):
+    """
+    A GPUShape drawn many times with a single draw call.
+    Besides the VAO, VBO and EBO of the base shape, it owns a second VBO with
+    per instance data. Every sprite comes from the same texture (an atlas, which
+    the shape does not own): regions holds one (u0, v0, u1, v1) row per sprite id.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.instanceVbo = None
+        self.instanceCount = 0
+        self.regions = np.array([[0, 0, 1, 1]], dtype=np.float32)
+
+    def initBuffers(self):
+        super().initBuffers()
+        self.instanceVbo = glGenBuffers(1)
+        return self
+
+    def fillInstances(self, instanceData):
+        """
+        Uploads the per instance data, a float32 array with one row per instance.
+        The buffer storage is re-specified every call (orphaning), so the driver
+        does not have to wait for the previous frame to finish reading it.
+        """
+        instanceData = np.ascontiguousarray(instanceData, dtype=np.float32)
+        self.instanceCount = len(instanceData)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.instanceVbo)
+        glBufferData(GL_ARRAY_BUFFER, instanceData.nbytes, instanceData, GL_STREAM_DRAW)
+
+    def clear(self):
+        """Freeing GPU memory"""
+
+        # The texture belongs to the atlas
+        self.texture = None
+
+        if self.instanceVbo != None:
+            glDeleteBuffers(1, [self.instanceVbo])
+
+        super().clear()
+
+
+class DynamicGPUShape(GPUShape):
+    """
+    A GPUShape whose vertices are rewritten every frame.
+    The indices are uploaded once; the vertices are streamed with streamVertices,
+    which orphans the previous storage before writing, so the driver can hand out
+    fresh memory instead of waiting for draws still reading the old contents.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.capacity = 0 # Bytes of the vertex buffer storage
+
+    def fillIndices(self, indices, usage=GL_STATIC_DRAW):
+        indices = np.array(indices, dtype=np.uint32)
+
+        # The element buffer binding is part of the bound VAO, so none must be bound here
+        gls.state.bindVertexArray(0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, len(indices) * SIZE_IN_BYTES, indices, usage)
+
+    def streamVertices(self, vertexData, indexCount):
+        """
+        Uploads vertexData (float32) and sets how many indices the next draw uses
+        """
+        vertexData = np.ascontiguousarray(vertexData, dtype=np.float32)
+        self.size = indexCount
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        self.capacity = max(self.capacity, vertexData.nbytes)
+        glBufferData(GL_ARRAY_BUFFER, self.capacity, None, GL_STREAM_DRAW)
+        glBufferSubData(GL_ARRAY_BUFFER, 0, vertexData.nbytes, vertexData)
@@ -1,17 +1,52 @@
 # coding=utf-8
 """Simple class to monitor the frames per second of an application"""
 
+import time
+import numpy as np
+from contextlib import contextmanager
+
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
 
+
+class PhaseTimer:
+    """
+    Ring buffer with the latest duration samples (in seconds) of a named phase of the frame
+    """
+
+    def __init__(self, name, capacity):
+        self.name = name
+        self.samples = np.zeros(capacity)
+        self.count = 0
+        self.index = 0
+        self.startTime = None
+
+    def add(self, duration):
+        self.samples[self.index] = duration
+        self.index = (self.index + 1) % len(self.samples)
+        self.count = min(self.count + 1, len(self.samples))
+
+    def stats(self):
+        """
+        Returns p50, p95, p99 and max of the stored samples, in miliseconds
+        """
+        if self.count == 0:
+            return 0.0, 0.0, 0.0, 0.0
+        samples = 1000.0 * self.samples[:self.count]
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return p50, p95, p99, samples.max()
+
+
 class PerformanceMonitor:
     """
     Convenience class to measure simple performance metrics
     """
     
-    def __init__(self, currentTime, period):
+    def __init__(self, currentTime, period, phaseSamples=512, trace=None):
         """
-        Set the first reference time and the period of time over to compute the average frames per second
+        Set the first reference time and the period of time over to compute the average frames per second.
+        Each named phase keeps its latest phaseSamples durations.
+        If a trace (FrameTrace) is given, frames, phases and events are also exported to it.
         """
         self.currentTime = currentTime
         self.timer = 0.0
@@ -19,12 +54,20 @@ class PerformanceMonitor:
         self.framesCounter = 0
         self.framesPerSecond = 0.0
         self.milisecondsPerFrame = 0.0
+        self.phaseSamples = phaseSamples
+        self.phases = {}
+        self.trace = trace
+        self.frameStart = time.perf_counter()
 
     def update(self, currentTime):
         """
         It must be called once per frame to update the internal metrics
         """
         self.framesCounter += 1
+        if self.trace is not None:
+            now = time.perf_counter()
+            self.trace.complete("frame", self.frameStart, now - self.frameStart)
+            self.frameStart = now
         self.timer += currentTime - self.currentTime
         self.currentTime = currentTime
         
@@ -46,5 +89,60 @@ class PerformanceMonitor:
         """
         return self.milisecondsPerFrame
 
+    def startPhase(self, name):
+        """
+        Starts timing the named phase of the current frame
+        """
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = PhaseTimer(name, self.phaseSamples)
+            self.phases[name] = phase
+        phase.startTime = time.perf_counter()
+
+    def endPhase(self, name):
+        """
+        Stops timing the named phase and stores its duration
+        """
+        phase = self.phases[name]
+        duration = time.perf_counter() - phase.startTime
+        phase.add(duration)
+        if self.trace is not None:
+            self.trace.complete(name, phase.startTime, duration, "phase")
+        phase.startTime = None
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Convenience context manager: with monitor.phase("draw"): ...
+        """
+        self.startPhase(name)
+        try:
+            yield
+        finally:
+            self.endPhase(name)
+
+    def event(self, name, args=None):
+        """
+        Records a point in time event (e.g. a wave spawn) in the trace, if there is one
+        """
+        if self.trace is not None:
+            self.trace.instant(name, args=args)
+
+    def getPhaseStats(self, name):
+        """
+        Returns p50, p95, p99 and max (ms) of the named phase
+        """
+        return self.phases[name].stats()
+
+    def phaseReport(self):
+        """
+        Returns a table with the percentiles of every phase, in the order they were first timed
+        """
+        lines = [f"{'phase':<16}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  [ms]"]
+        for name, phase in self.phases.items():
+            p50, p95, p99, maximum = phase.stats()
+            lines.append(f"{name:<16}{p50:>9.3f}{p95:>9.3f}{p99:>9.3f}{maximum:>9.3f}")
+        return "\n".join(lines)
+
     def __str__(self):
         return f" [{self.framesPerSecond:.2f} fps - {self.milisecondsPerFrame:.2f} ms]"
\ No newline at end of file
@@ -0,0 +1,156 @@
+# coding=utf-8
+"""Persistent cache of linked shader programs, to skip GLSL compilation at startup"""
+
+import os
+import hashlib
+import numpy as np
+from OpenGL.GL import *
+import OpenGL.GL.shaders
+import grafica.gl_state as gls
+
+
+class ProgramCache:
+    """
+    Keeps the binary of every linked program (glGetProgramBinary) in a directory,
+    in a file named after a hash of the shader sources and the driver (vendor,
+    renderer and version strings). The next time the same program is requested,
+    the binary is given to glProgramBinary instead of compiling the sources.
+
+    A driver may reject a stored binary (e.g. after an update); then the program
+    is compiled as usual and the file is replaced.
+
+    With directory None, or when the driver offers no binary formats, every
+    program is just compiled, so no GL context is needed until compileProgram.
+
+    Counters: loaded (from disk), compiled and rejected (binaries refused by the driver).
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.loaded = 0
+        self.compiled = 0
+        self.rejected = 0
+        self._driver = None
+
+    def driver(self):
+        """
+        Identification of the driver of the current context
+        """
+        if self._driver is None:
+            self._driver = b"\n".join(glGetString(name) or b"" for name in (GL_VENDOR, GL_RENDERER, GL_VERSION))
+        return self._driver
+
+    def enabled(self):
+        return self.directory is not None and glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+
+    def path(self, vertexSource, fragmentSource):
+        key = hashlib.sha256()
+        for part in (self.driver(), vertexSource.encode(), fragmentSource.encode()):
+            key.update(part)
+            key.update(b"\0")
+        return os.path.join(self.directory, key.hexdigest() + ".bin")
+
+    def compileProgram(self, vertexSource, fragmentSource):
+        """
+        Returns a linked program with the given vertex and fragment shader sources,
+        loaded from the cache when possible
+        """
+        if not self.enabled():
+            self.compiled += 1
+            return OpenGL.GL.shaders.compileProgram(
+                OpenGL.GL.shaders.compileShader(vertexSource, GL_VERTEX_SHADER),
+                OpenGL.GL.shaders.compileShader(fragmentSource, GL_FRAGMENT_SHADER))
+
+        path = self.path(vertexSource, fragmentSource)
+        program = self._load(path)
+        if program is not None:
+            self.loaded += 1
+            return program
+
+        program = self._link(vertexSource, fragmentSource)
+        self.compiled += 1
+        self._store(program, path)
+        return program
+
+    def _load(self, path):
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+
+        # File: binary format (uint32, little endian) followed by the binary
+        binaryFormat = int.from_bytes(data[:4], "little")
+        binary = np.frombuffer(data, dtype=np.uint8, offset=4)
+
+        program = glCreateProgram()
+        try:
+            glProgramBinary(program, binaryFormat, binary, len(binary))
+            linked = glGetProgramiv(program, GL_LINK_STATUS)
+        except OpenGL.error.GLError:
+            linked = False
+
+        if not linked:
+            gls.state.deleteProgram(program)
+            self.rejected += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return program
+
+    def _link(self, vertexSource, fragmentSource):
+        shaders = [OpenGL.GL.shaders.compileShader(vertexSource, GL_VERTEX_SHADER),
+            OpenGL.GL.shaders.compileShader(fragmentSource, GL_FRAGMENT_SHADER)]
+
+        program = glCreateProgram()
+        for shader in shaders:
+            glAttachShader(program, shader)
+        # Asking the driver to keep a retrievable binary, before linking
+        glProgramParameteri(program, GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
+        glLinkProgram(program)
+
+        for shader in shaders:
+            glDetachShader(program, shader)
+            glDeleteShader(shader)
+
+        if not glGetProgramiv(program, GL_LINK_STATUS):
+            log = glGetProgramInfoLog(program)
+            gls.state.deleteProgram(program)
+            raise RuntimeError("Link failure: " + str(log))
+        return program
+
+    def _store(self, program, path):
+        length = int(glGetProgramiv(program, GL_PROGRAM_BINARY_LENGTH))
+        if length == 0:
+            return
+
+        binary = np.empty(length, dtype=np.uint8)
+        written = np.zeros(1, dtype=np.int32)
+        binaryFormat = np.zeros(1, dtype=np.uint32)
+        glGetProgramBinary(program, length, written, binaryFormat, binary)
+
+        # Written to a temporary file and renamed, so a partial file is never loaded.
+        # The temporary name carries the process id, so processes sharing the directory never mix their writes.
+        # The cache is only an optimization: if it can not be written, it is skipped
+        temporary = path + "." + str(os.getpid()) + ".tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary, "wb") as file:
+                file.write(int(binaryFormat[0]).to_bytes(4, "little"))
+                file.write(binary[:int(written[0])].tobytes())
+            os.replace(temporary, path)
+        except OSError:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+
+
+# Cache used by every pipeline; disabled until a directory is given
+cache = ProgramCache()
+
+
+def compileProgram(vertexSource, fragmentSource):
+    return cache.compileProgram(vertexSource, fragmentSource)
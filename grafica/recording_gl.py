@@ -0,0 +1,276 @@
+# coding=utf-8
+"""A recording stand-in for PyOpenGL, to run the render path without a GPU or a window"""
+
+import re
+import sys
+import importlib
+import numpy as np
+import OpenGL.GL.shaders
+from OpenGL.GL import (GL_ACTIVE_UNIFORMS, GL_FLOAT, GL_FLOAT_VEC2, GL_FLOAT_VEC3, GL_FLOAT_VEC4,
+    GL_INT, GL_BOOL, GL_FLOAT_MAT4, GL_SAMPLER_2D)
+
+# Modules whose "from OpenGL.GL import *" names are replaced by default
+DEFAULT_MODULES = ("grafica.gl_state", "grafica.gpu_shape", "grafica.easy_shaders", "grafica.scene_graph",
+    "grafica.texture_atlas", "grafica.sprite_batch", "shader")
+
+# Bytes of a 4x4 float32 matrix
+MATRIX_BYTES = 64
+
+# Type reported for the uniforms declared in the shader sources
+UNIFORM_TYPES = {"float": GL_FLOAT, "vec2": GL_FLOAT_VEC2, "vec3": GL_FLOAT_VEC3, "vec4": GL_FLOAT_VEC4,
+    "int": GL_INT, "bool": GL_BOOL, "mat4": GL_FLOAT_MAT4, "sampler2D": GL_SAMPLER_2D}
+
+
+class RecordingGL:
+    """
+    Records OpenGL calls instead of executing them.
+
+    install() replaces the gl* functions that the given modules imported with
+    "from OpenGL.GL import *" (and the shader compiler), so pipelines, shapes and
+    scene graph traversals run unchanged on a machine without a GPU. Every call
+    is counted; GL constants are left untouched.
+
+    Usage:
+        gl = RecordingGL().install()
+        sg.drawSceneGraphNode(scene, pipeline, "transform")
+        print(gl.counters())
+        gl.uninstall()
+    """
+
+    def __init__(self):
+        self.originals = []
+        self.nextName = 1
+        self.uniformLocations = {}
+        self.shaderUniforms = {}
+        self.programUniforms = {}
+        self.program = 0
+        self.vao = 0
+        self.texture = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Sets every counter to zero, e.g. at the beginning of a frame.
+        The bound state (program, VAO, texture) is kept.
+        """
+        self.drawCalls = 0
+        self.indices = 0
+        self.useProgramCalls = 0
+        self.programSwitches = 0
+        self.vaoBinds = 0
+        self.textureBinds = 0
+        self.bufferBinds = 0
+        self.uniformUploads = 0
+        self.uniformLocationQueries = 0
+        self.bufferBytes = 0
+        self.textureBytes = 0
+        self.uniformBytes = 0
+        self.otherCalls = {}
+
+    @property
+    def bytesUploaded(self):
+        return self.bufferBytes + self.textureBytes + self.uniformBytes
+
+    def counters(self):
+        """
+        Returns a dictionary with every counter
+        """
+        return {
+            "drawCalls": self.drawCalls,
+            "indices": self.indices,
+            "useProgramCalls": self.useProgramCalls,
+            "programSwitches": self.programSwitches,
+            "vaoBinds": self.vaoBinds,
+            "textureBinds": self.textureBinds,
+            "bufferBinds": self.bufferBinds,
+            "uniformUploads": self.uniformUploads,
+            "uniformLocationQueries": self.uniformLocationQueries,
+            "bufferBytes": self.bufferBytes,
+            "textureBytes": self.textureBytes,
+            "uniformBytes": self.uniformBytes,
+            "bytesUploaded": self.bytesUploaded,
+            "otherCalls": dict(self.otherCalls)}
+
+    def _newNames(self, n):
+        names = list(range(self.nextName, self.nextName + n))
+        self.nextName += n
+        return names[0] if n == 1 else names
+
+    # Object creation
+
+    def glGenVertexArrays(self, n):
+        return self._newNames(n)
+
+    def glGenBuffers(self, n):
+        return self._newNames(n)
+
+    def glGenTextures(self, n):
+        return self._newNames(n)
+
+    def compileShader(self, source, shaderType):
+        # The uniform names and types are kept, so the program can report its active uniforms
+        shader = self._newNames(1)
+        self.shaderUniforms[shader] = [(name, UNIFORM_TYPES.get(kind, 0))
+            for kind, name in re.findall(r"uniform\s+(\w+)\s+(\w+)", source)]
+        return shader
+
+    def compileProgram(self, *shaders, **kwargs):
+        program = self._newNames(1)
+        uniforms = {}
+        for shader in shaders:
+            for name, kind in self.shaderUniforms.get(shader, []):
+                uniforms.setdefault(name, kind)
+        self.programUniforms[program] = list(uniforms.items())
+        return program
+
+    def glGetProgramiv(self, program, pname):
+        if pname == GL_ACTIVE_UNIFORMS:
+            return len(self.programUniforms.get(program, []))
+        return 0
+
+    def glGetActiveUniform(self, program, index):
+        name, kind = self.programUniforms[program][index]
+        return name.encode(), 1, kind
+
+    # State changes
+
+    def glUseProgram(self, program):
+        self.useProgramCalls += 1
+        if program != self.program:
+            self.programSwitches += 1
+            self.program = program
+
+    def glBindVertexArray(self, vao):
+        self.vaoBinds += 1
+        self.vao = vao
+
+    def glBindTexture(self, target, texture):
+        self.textureBinds += 1
+        self.texture = texture
+
+    def glBindBuffer(self, target, buffer):
+        self.bufferBinds += 1
+
+    # Uploads
+
+    def glBufferData(self, target, size, data, usage):
+        # Without data only storage is allocated (e.g. orphaning), nothing is uploaded
+        if data is not None:
+            self.bufferBytes += int(size)
+
+    def glBufferSubData(self, target, offset, size, data):
+        self.bufferBytes += int(size)
+
+    def glTexImage2D(self, target, level, internalFormat, width, height, border, format, type, data):
+        if isinstance(data, np.ndarray):
+            self.textureBytes += data.nbytes
+        else:
+            self.textureBytes += 4 * width * height
+
+    def glGetUniformLocation(self, program, name):
+        self.uniformLocationQueries += 1
+        key = (program, name)
+        location = self.uniformLocations.get(key)
+        if location is None:
+            location = len(self.uniformLocations)
+            self.uniformLocations[key] = location
+        return location
+
+    def glGetAttribLocation(self, program, name):
+        return 0
+
+    def glUniformMatrix4fv(self, location, count, transpose, value):
+        self.uniformUploads += 1
+        self.uniformBytes += count * MATRIX_BYTES
+
+    def glUniform1f(self, location, value):
+        self.uniformUploads += 1
+        self.uniformBytes += 4
+
+    def glUniform1i(self, location, value):
+        self.uniformUploads += 1
+        self.uniformBytes += 4
+
+    def glUniform2f(self, location, x, y):
+        self.uniformUploads += 1
+        self.uniformBytes += 8
+
+    def glUniform3f(self, location, x, y, z):
+        self.uniformUploads += 1
+        self.uniformBytes += 12
+
+    def glUniform4f(self, location, x, y, z, w):
+        self.uniformUploads += 1
+        self.uniformBytes += 16
+
+    def glUniform1fv(self, location, count, value):
+        self.uniformUploads += 1
+        self.uniformBytes += 4 * count
+
+    def glUniform2fv(self, location, count, value):
+        self.uniformUploads += 1
+        self.uniformBytes += 8 * count
+
+    def glUniform3fv(self, location, count, value):
+        self.uniformUploads += 1
+        self.uniformBytes += 12 * count
+
+    def glUniform4fv(self, location, count, value):
+        self.uniformUploads += 1
+        self.uniformBytes += 16 * count
+
+    # Integer vectors take the same bytes as float ones
+    glUniform1iv = glUniform1fv
+    glUniform2iv = glUniform2fv
+    glUniform3iv = glUniform3fv
+    glUniform4iv = glUniform4fv
+
+    # Draw calls
+
+    def glDrawElements(self, mode, count, type, indices):
+        self.drawCalls += 1
+        self.indices += count
+
+    def glDrawElementsInstanced(self, mode, count, type, indices, instances):
+        self.drawCalls += 1
+        self.indices += count * instances
+
+    # Anything else only gets counted by name
+
+    def _other(self, name):
+        def call(*args, **kwargs):
+            self.otherCalls[name] = self.otherCalls.get(name, 0) + 1
+        return call
+
+    def install(self, modules=DEFAULT_MODULES):
+        """
+        Replaces the gl* functions of the given modules (objects or names) with recording ones.
+        Returns itself, so gl = RecordingGL().install() can be used.
+        """
+        for module in modules:
+            if isinstance(module, str):
+                module = sys.modules.get(module) or importlib.import_module(module)
+            for name, value in list(vars(module).items()):
+                if name.startswith("gl") and name[2:3].isupper() and callable(value):
+                    replacement = getattr(self, name, None) or self._other(name)
+                    self.originals.append((module, name, value))
+                    setattr(module, name, replacement)
+
+        for name in ("compileShader", "compileProgram"):
+            self.originals.append((OpenGL.GL.shaders, name, getattr(OpenGL.GL.shaders, name)))
+            setattr(OpenGL.GL.shaders, name, getattr(self, name))
+        return self
+
+    def uninstall(self):
+        """
+        Restores the original PyOpenGL functions
+        """
+        for module, name, value in reversed(self.originals):
+            setattr(module, name, value)
+        self.originals = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.uninstall()
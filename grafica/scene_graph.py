@@ -3,13 +3,29 @@
 
 from OpenGL.GL import *
 import OpenGL.GL.shaders
+import itertools
 import numpy as np
 import grafica.transformations as tr
 import grafica.gpu_shape as gs
+import grafica.gl_state as gls
 
 __author__ = "Daniel Calderon"
 __license__ = "MIT"
 
+# Every transform assignment gets a new, globally unique version number
+_versions = itertools.count(1)
+
+# Default parent transform of the compiled draw lists, shared so the default
+# of compileSceneGraphNode and drawCompiledSceneGraphNode is the same matrix
+IDENTITY = tr.identity()
+IDENTITY.flags.writeable = False
+
+# Matrix products computed and avoided by the traversals, see beginFrame
+matmuls = 0
+cachedTransforms = 0
+lastFrameMatmuls = 0
+lastFrameCachedTransforms = 0
+
 
 class SceneGraphNode:
     """
@@ -17,11 +33,62 @@ class SceneGraphNode:
     Each node represents a group of objects
     Each leaf represents a basic figure (GPUShape)
     To identify each node properly, it MUST have a unique name
+
+    Each node keeps an index name -> node of its whole subtree. The index is
+    updated incrementally whenever childs are added or removed, so findNode
+    is a dictionary lookup. Adding a node whose name is already used by a
+    different node in the same graph raises a ValueError.
+
+    The drawing traversals cache the world transform of every path through the
+    graph, so only nodes whose transform was assigned since the last traversal
+    (or that are below one of those) are multiplied again. The transform must be
+    assigned (node.transform = ...), not modified in place, to be noticed.
+
+    A subtree can also be compiled into a flat draw list, see compileSceneGraphNode.
     """
     def __init__(self, name):
         self.name = name
+        self.parents = []
+        self._compiled = None
         self.transform = tr.identity()
-        self.childs = []
+        # name -> [node, number of paths reaching that node from here]
+        self.index = {name: [self, 1]}
+        self._childs = ChildList(self)
+        # World transform cache used when this node is the root of a traversal
+        self._rootCache = TransformCache()
+
+    @property
+    def transform(self):
+        return self._transform
+
+    @transform.setter
+    def transform(self, newTransform):
+        self._transform = newTransform
+        self._version = next(_versions)
+        self._invalidateCompiled(False)
+
+    def _invalidateCompiled(self, structure):
+        # Compiled draw lists of this node and its ancestors must be rebuilt (structure changed)
+        # or only have their matrices refreshed (a transform changed)
+        if self._compiled is not None:
+            if structure:
+                self._compiled = None
+            else:
+                self._compiled.dirty = True
+        for parent in self.parents:
+            parent._invalidateCompiled(structure)
+
+    @property
+    def childs(self):
+        return self._childs
+
+    @childs.setter
+    def childs(self, newChilds):
+        # "node.childs += [...]" assigns back the very same list
+        if newChilds is self._childs:
+            return
+        self._childs.clear()
+        self._childs.extend(newChilds)
 
     def clear(self):
         """Freeing GPU memory"""
@@ -29,24 +96,175 @@ class SceneGraphNode:
         for child in self.childs:
             child.clear()
 
-            
+    def _checkIndex(self, entries):
+        # Every name must refer to the same node in this node and all its ancestors
+        for name, node, count in entries:
+            entry = self.index.get(name)
+            if entry is not None and entry[0] is not node:
+                raise ValueError("Duplicated node name in scene graph: " + str(name))
+        for parent in self.parents:
+            parent._checkIndex(entries)
+
+    def _updateIndex(self, entries, sign):
+        # Adding (sign=1) or removing (sign=-1) index entries here and in all ancestors
+        for name, node, count in entries:
+            entry = self.index.get(name)
+            if entry is None:
+                self.index[name] = [node, count]
+            else:
+                entry[1] += sign * count
+                if entry[1] == 0:
+                    del self.index[name]
+        for parent in self.parents:
+            parent._updateIndex(entries, sign)
+
+    def _attach(self, child):
+        if not isinstance(child, SceneGraphNode):
+            return
+        entries = [(name, entry[0], entry[1]) for name, entry in child.index.items()]
+        self._checkIndex(entries)
+        child.parents.append(self)
+        self._updateIndex(entries, 1)
+        self._invalidateCompiled(True)
+
+    def _detach(self, child):
+        if not isinstance(child, SceneGraphNode):
+            return
+        entries = [(name, entry[0], entry[1]) for name, entry in child.index.items()]
+        child.parents.remove(self)
+        self._updateIndex(entries, -1)
+        self._invalidateCompiled(True)
+
+
+class TransformCache:
+    """
+    World transform of one path through the graph, with the parent world
+    transform and the local transform version it was computed from.
+    childs holds the caches of the paths that continue through each child.
+    """
+    __slots__ = ("parentTransform", "version", "world", "childs")
+
+    def __init__(self):
+        self.parentTransform = None
+        self.version = 0
+        self.world = None
+        self.childs = []
+
+
+def worldTransform(node, parentTransform, cache):
+    """
+    World transform of node through the path of cache.
+    It is only recomputed when the parent world transform is a different
+    matrix or the local transform of the node was assigned again.
+    """
+    global matmuls, cachedTransforms
+
+    if cache.parentTransform is not parentTransform or cache.version != node._version:
+        cache.world = np.matmul(parentTransform, node.transform)
+        cache.parentTransform = parentTransform
+        cache.version = node._version
+        matmuls += 1
+    else:
+        cachedTransforms += 1
+    return cache.world
+
+
+def childCaches(cache, count):
+    """
+    Caches for the paths through the first count childs of the cached path
+    """
+    caches = cache.childs
+    while len(caches) < count:
+        caches.append(TransformCache())
+    return caches
+
+
+def beginFrame():
+    """
+    It must be called once per frame to keep the matmul counters of the latest frame
+    """
+    global matmuls, cachedTransforms, lastFrameMatmuls, lastFrameCachedTransforms
+    lastFrameMatmuls = matmuls
+    lastFrameCachedTransforms = cachedTransforms
+    matmuls = 0
+    cachedTransforms = 0
+
+
+class ChildList(list):
+    """
+    List of childs of a SceneGraphNode.
+    It notifies its owner whenever a child is added or removed,
+    so the name index of the graph stays up to date.
+    """
+    def __init__(self, owner):
+        super().__init__()
+        self.owner = owner
+
+    def append(self, child):
+        self.owner._attach(child)
+        super().append(child)
+
+    def extend(self, childs):
+        for child in childs:
+            self.append(child)
+
+    def __iadd__(self, childs):
+        self.extend(childs)
+        return self
+
+    def __imul__(self, k):
+        # Repeating the childs adds new paths to them, so they go through append
+        if k <= 0:
+            self.clear()
+        else:
+            self.extend(list(self) * (k - 1))
+        return self
+
+    def insert(self, position, child):
+        self.owner._attach(child)
+        super().insert(position, child)
+
+    def remove(self, child):
+        super().remove(child)
+        self.owner._detach(child)
+
+    def pop(self, position=-1):
+        child = super().pop(position)
+        self.owner._detach(child)
+        return child
+
+    def clear(self):
+        childs = list(self)
+        super().clear()
+        for child in childs:
+            self.owner._detach(child)
+
+    def __setitem__(self, key, value):
+        old = self[key] if isinstance(key, slice) else [self[key]]
+        new = list(value) if isinstance(key, slice) else [value]
+        for child in old:
+            self.owner._detach(child)
+        for child in new:
+            self.owner._attach(child)
+        super().__setitem__(key, value if not isinstance(key, slice) else new)
+
+    def __delitem__(self, key):
+        old = self[key] if isinstance(key, slice) else [self[key]]
+        super().__delitem__(key)
+        for child in old:
+            self.owner._detach(child)
+
 
-    
 def findNode(node, name):
 
     # The name was not found in this path
     if isinstance(node, gs.GPUShape):
         return None
 
-    # This is the requested node
-    if node.name == name:
-        return node
-    
-    # All childs are checked for the requested name
-    for child in node.childs:
-        foundNode = findNode(child, name)
-        if foundNode != None:
-            return foundNode
+    # The index of this node covers its whole subtree
+    entry = node.index.get(name)
+    if entry is not None:
+        return entry[0]
 
     # No child of this node had the requested name
     return None
@@ -85,22 +303,194 @@ def findPosition(node, name, parentTransform=tr.identity()):
     return None
 
 
-def drawSceneGraphNode(node, pipeline, transformName, parentTransform=tr.identity()):
+# Components of the uniform types handled by setUniforms and getUniforms
+FLOAT_UNIFORMS = {GL_FLOAT: 1, GL_FLOAT_VEC2: 2, GL_FLOAT_VEC3: 3, GL_FLOAT_VEC4: 4}
+INT_UNIFORMS = {GL_INT: 1, GL_INT_VEC2: 2, GL_INT_VEC3: 3, GL_INT_VEC4: 4, GL_BOOL: 1,
+    GL_SAMPLER_2D: 1, GL_SAMPLER_3D: 1, GL_SAMPLER_CUBE: 1}
+
+
+def _uniformKind(pipeline, name):
+    """
+    Location, components and integer flag of an active uniform, or None if the
+    program has no active uniform with that name (GL would ignore it as well)
+    """
+    kind = gls.state.uniformType(pipeline.shaderProgram, name)
+    if kind is None:
+        return None
+    location = gls.state.uniformLocation(pipeline.shaderProgram, name)
+    if kind in FLOAT_UNIFORMS:
+        return location, FLOAT_UNIFORMS[kind], False
+    if kind in INT_UNIFORMS:
+        return location, INT_UNIFORMS[kind], True
+    raise ValueError("Unsupported uniform type for " + str(name))
+
+
+def setUniforms(pipeline, uniforms):
+    """
+    Uploads a dictionary name -> value of uniforms to the pipeline, which must be in use.
+    The call is chosen by the type declared in the shader (float, int, bool or sampler,
+    with 1 to 4 components), so e.g. 1 is sent as 1.0 to a float uniform.
+    """
+    for name, value in uniforms.items():
+        uniform = _uniformKind(pipeline, name)
+        if uniform is None:
+            continue
+        location, components, integer = uniform
+        value = np.asarray(value, dtype=np.int32 if integer else np.float32).reshape(components)
+        if integer:
+            (glUniform1iv, glUniform2iv, glUniform3iv, glUniform4iv)[components - 1](location, 1, value)
+        else:
+            (glUniform1fv, glUniform2fv, glUniform3fv, glUniform4fv)[components - 1](location, 1, value)
+
+
+def getUniforms(pipeline, names):
+    """
+    Current values of the given uniforms of the pipeline, as a dictionary for setUniforms
+    """
+    values = {}
+    for name in names:
+        uniform = _uniformKind(pipeline, name)
+        if uniform is None:
+            continue
+        location, components, integer = uniform
+        value = np.zeros(4, dtype=np.int32 if integer else np.float32)
+        (glGetUniformiv if integer else glGetUniformfv)(pipeline.shaderProgram, location, value)
+        values[name] = value[:components]
+    return values
+
+
+def drawSceneGraphNode(node, pipeline, transformName, parentTransform=tr.identity(), cache=None, uniforms=None):
+    """
+    Draws every leaf of the subtree with its world transform.
+    uniforms: optional dictionary name -> value uploaded once before drawing the
+    subtree (e.g. {"tint": (1, 0, 0, 1)}); their previous values are restored afterwards.
+    """
     assert(isinstance(node, SceneGraphNode))
 
-    # Composing the transformations through this path
-    newTransform = np.matmul(parentTransform, node.transform)
+    previous = None
+    if uniforms is not None:
+        previous = getUniforms(pipeline, uniforms)
+        setUniforms(pipeline, uniforms)
+
+    # Composing the transformations through this path, reusing the cached one if nothing changed
+    if cache is None:
+        cache = node._rootCache
+    newTransform = worldTransform(node, parentTransform, cache)
 
     # If the child node is a leaf, it should be a GPUShape.
     # Hence, it can be drawn with drawCall
     if len(node.childs) == 1 and isinstance(node.childs[0], gs.GPUShape):
         leaf = node.childs[0]
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, transformName), 1, GL_TRUE, newTransform)
+        glUniformMatrix4fv(gls.state.uniformLocation(pipeline.shaderProgram, transformName), 1, GL_TRUE, newTransform)
         pipeline.drawCall(leaf)
 
     # If the child node is not a leaf, it MUST be a SceneGraphNode,
     # so this draw function is called recursively
     else:
-        for child in node.childs:
-            drawSceneGraphNode(child, pipeline, transformName, newTransform)
+        for child, childCache in zip(node.childs, childCaches(cache, len(node.childs))):
+            drawSceneGraphNode(child, pipeline, transformName, newTransform, childCache)
+
+    if previous is not None:
+        setUniforms(pipeline, previous)
+
+
+class CompiledSceneGraph:
+    """
+    Flat draw list of a subtree: one record per leaf path, with its GPUShape and
+    its world transform stored in a contiguous (K, 4, 4) float32 block.
+
+    nodes are the distinct nodes of the subtree and levels[d][k] the position in
+    nodes of the node at depth d of the path of record k (len(nodes), an identity,
+    past its end). When only transforms changed, the matrices are refreshed with
+    one batched product per depth instead of rebuilding the list.
+    """
+
+    def __init__(self, node, parentTransform):
+        # A copy, so the list is recompiled when the parent changes even if it is modified in place
+        self.parentTransform = np.array(parentTransform, dtype=np.float32)
+        self.shapes = []
+        paths = []
+
+        # Iterative pre-order traversal, in the same order as drawSceneGraphNode
+        stack = [(node, (node,))]
+        while stack:
+            current, path = stack.pop()
+            if len(current.childs) == 1 and isinstance(current.childs[0], gs.GPUShape):
+                self.shapes.append(current.childs[0])
+                paths.append(path)
+            else:
+                for child in reversed(current.childs):
+                    if isinstance(child, SceneGraphNode):
+                        stack.append((child, path + (child,)))
+
+        positions = {}
+        for path in paths:
+            for n in path:
+                positions.setdefault(id(n), (len(positions), n))
+        self.nodes = [n for position, n in positions.values()]
+
+        depth = max((len(path) for path in paths), default=0)
+        identity = len(self.nodes)
+        self.levels = [np.array([positions[id(path[d])][0] if d < len(path) else identity for path in paths], dtype=np.intp)
+            for d in range(depth)]
+        self.transforms = np.empty((len(paths), 4, 4), dtype=np.float32)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Recomputes the world transforms from the current local transforms
+        """
+        global matmuls
+
+        local = np.stack([n.transform for n in self.nodes] + [tr.identity()])
+        world = np.broadcast_to(self.parentTransform, self.transforms.shape)
+        for level in self.levels:
+            world = np.matmul(world, local[level])
+            matmuls += 1
+        self.transforms[...] = world
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.shapes)
+
+
+def compileSceneGraphNode(node, parentTransform=IDENTITY):
+    """
+    Compiles the subtree of node into a flat draw list, kept in the node.
+    Later transform assignments inside the subtree only mark it dirty; adding or
+    removing childs anywhere in it discards it.
+    """
+    assert(isinstance(node, SceneGraphNode))
+    node._compiled = CompiledSceneGraph(node, parentTransform)
+    return node._compiled
+
+
+def drawCompiledSceneGraphNode(node, pipeline, transformName, parentTransform=IDENTITY, uniforms=None):
+    """
+    Same result as drawSceneGraphNode, drawing from the compiled list of the
+    subtree with a flat loop. The list is compiled or refreshed when needed;
+    it is kept while parentTransform has the same values it was compiled with.
+    As there, uniforms are only set during the call.
+    """
+    global cachedTransforms
+
+    previous = None
+    if uniforms is not None:
+        previous = getUniforms(pipeline, uniforms)
+        setUniforms(pipeline, uniforms)
+
+    compiled = node._compiled
+    if compiled is None or not np.array_equal(compiled.parentTransform, parentTransform):
+        compiled = compileSceneGraphNode(node, parentTransform)
+    elif compiled.dirty:
+        compiled.refresh()
+    else:
+        cachedTransforms += len(compiled)
+
+    location = gls.state.uniformLocation(pipeline.shaderProgram, transformName)
+    for shape, transform in zip(compiled.shapes, compiled.transforms):
+        glUniformMatrix4fv(location, 1, GL_TRUE, transform)
+        pipeline.drawCall(shape)
 
+    if previous is not None:
+        setUniforms(pipeline, previous)
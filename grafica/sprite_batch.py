@@ -0,0 +1,127 @@
+# coding=utf-8
+"""Batching of textured 2D quads, streamed to the GPU once per flush"""
+
+import numpy as np
+from OpenGL.GL import *
+import grafica.gpu_shape as gs
+import grafica.gl_state as gls
+
+# Floats per vertex: x, y, z, s, t, r, g, b, a
+VERTEX_FLOATS = 9
+
+# Corners of the unit quad centered at the origin (as in basic_shapes.createTextureQuad),
+# as homogeneous columns, and their texture coordinates (t = 0 is the top of the image)
+QUAD_CORNERS = np.array([
+    [-0.5,  0.5, 0.5, -0.5],
+    [-0.5, -0.5, 0.5,  0.5],
+    [ 0.0,  0.0, 0.0,  0.0],
+    [ 1.0,  1.0, 1.0,  1.0]], dtype=np.float32)
+QUAD_TEXCOORDS = np.array([[0, 1], [1, 1], [1, 0], [0, 0]], dtype=np.float32)
+QUAD_INDICES = np.array([0, 1, 2, 2, 3, 0], dtype=np.uint32)
+
+IDENTITY = np.identity(4, dtype=np.float32)
+
+
+class SpriteBatch:
+    """
+    Collects textured quads during the frame and draws them with as few calls as possible.
+
+    Quads are written into a CPU side NumPy staging array; flush() uploads the used
+    part to a dynamic vertex buffer (orphaned on each upload) and issues a single
+    glDrawElements. All sprites come from one TextureAtlas, so they never break the
+    batch; it is only flushed early when the staging array is full.
+
+    Usage, with the SpriteBatchShaderProgram in use:
+        batch.add("hinata", transform)
+        batch.addMany("humano", transforms, colors)
+        batch.flush()
+    """
+
+    def __init__(self, pipeline, atlas, maxSprites=4096):
+        self.pipeline = pipeline
+        self.atlas = atlas
+        self.maxSprites = maxSprites
+        self.staging = np.zeros((maxSprites, 4, VERTEX_FLOATS), dtype=np.float32)
+        self.count = 0 # Quads written since the last flush
+
+        # Counters of the latest frame
+        self.drawCalls = 0
+        self.sprites = 0
+
+        self.gpuShape = gs.DynamicGPUShape().initBuffers()
+        pipeline.setupVAO(self.gpuShape)
+        self.gpuShape.fillIndices((QUAD_INDICES[None, :] + 4 * np.arange(maxSprites, dtype=np.uint32)[:, None]).reshape(-1))
+        self.gpuShape.texture = atlas.upload()
+
+        # Texture coordinates of the quad corners inside each atlas region
+        self.texCoords = {}
+        for name, (u0, v0, u1, v1) in atlas.regions.items():
+            self.texCoords[name] = np.column_stack((
+                u0 + QUAD_TEXCOORDS[:, 0] * (u1 - u0),
+                v0 + QUAD_TEXCOORDS[:, 1] * (v1 - v0)))
+
+    def beginFrame(self):
+        self.drawCalls = 0
+        self.sprites = 0
+
+    def add(self, name, transform, color=(1.0, 1.0, 1.0, 1.0)):
+        """
+        Adds one quad: the unit quad transformed by the 4x4 transform, with the named
+        atlas region as texture and its color multiplied by color (rgba)
+        """
+        if self.count == self.maxSprites:
+            self.flush()
+
+        quad = self.staging[self.count]
+        quad[:, 0:3] = (np.asarray(transform, dtype=np.float32) @ QUAD_CORNERS)[0:3].T
+        quad[:, 3:5] = self.texCoords[name]
+        quad[:, 5:9] = color
+        self.count += 1
+
+    def addMany(self, name, transforms, colors=None):
+        """
+        Adds N quads with the same atlas region: transforms is (N, 4, 4) and colors,
+        if given, (N, 4) or a single rgba color
+        """
+        transforms = np.asarray(transforms, dtype=np.float32)
+        start = 0
+        while start < len(transforms):
+            if self.count == self.maxSprites:
+                self.flush()
+            k = min(len(transforms) - start, self.maxSprites - self.count)
+            quads = self.staging[self.count:self.count + k]
+
+            # (k, 4, 4) @ (4, 4) -> corners of each quad as columns
+            corners = transforms[start:start + k] @ QUAD_CORNERS
+            quads[:, :, 0:3] = corners[:, 0:3, :].transpose(0, 2, 1)
+            quads[:, :, 3:5] = self.texCoords[name]
+            if colors is None:
+                quads[:, :, 5:9] = 1.0
+            else:
+                colors = np.asarray(colors, dtype=np.float32)
+                quads[:, :, 5:9] = colors[start:start + k, None, :] if colors.ndim == 2 else colors
+
+            self.count += k
+            start += k
+
+    def flush(self):
+        """
+        Uploads the collected quads and draws them with a single call.
+        The batch pipeline must be in use.
+        """
+        if self.count == 0:
+            return
+
+        # Vertices are already in world coordinates
+        glUniformMatrix4fv(gls.state.uniformLocation(self.pipeline.shaderProgram, "transform"), 1, GL_TRUE, IDENTITY)
+        self.gpuShape.streamVertices(self.staging[:self.count], 6 * self.count)
+        self.pipeline.drawCall(self.gpuShape)
+
+        self.drawCalls += 1
+        self.sprites += self.count
+        self.count = 0
+
+    def clear(self):
+        """Freeing GPU memory (the atlas texture belongs to the atlas)"""
+        self.gpuShape.texture = None
+        self.gpuShape.clear()
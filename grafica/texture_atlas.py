@@ -0,0 +1,111 @@
+# coding=utf-8
+"""Packing of several images into a single texture, with a table of UV regions"""
+
+import os
+import math
+import numpy as np
+from OpenGL.GL import *
+from PIL import Image
+import grafica.gl_state as gls
+
+
+class TextureAtlas:
+    """
+    Packs several images into one RGBA image using shelves: images are sorted
+    by height and placed left to right in rows. Each image gets a region
+    (u0, v0, u1, v1) in texture coordinates, where v = 0 is the top row of the
+    image, just like the texture coordinates used by basic_shapes.
+
+    Every shape referencing the atlas shares the same GL texture, so drawing
+    different sprites does not need texture binds in between.
+    Texture coordinates outside [0, 1] (repetition) are not supported.
+    """
+
+    def __init__(self, images, padding=2, maxWidth=4096):
+        """
+        images: dictionary name -> path of the image file
+        padding: empty pixels around each image, so neighbours never bleed into each other
+        """
+        self.padding = padding
+        self.regions = {}
+        self.texture = None
+
+        loaded = {name: Image.open(path).convert("RGBA") for name, path in images.items()}
+
+        # Shelf width: about the side of a square with the total area, but wide enough for any image
+        area = sum((im.size[0] + 2 * padding) * (im.size[1] + 2 * padding) for im in loaded.values())
+        widest = max(im.size[0] + 2 * padding for im in loaded.values())
+        width = min(maxWidth, max(widest, int(math.ceil(math.sqrt(area)))))
+
+        positions = {}
+        x, y, shelfHeight = 0, 0, 0
+        for name in sorted(loaded, key=lambda n: loaded[n].size[1], reverse=True):
+            w, h = loaded[name].size
+            w += 2 * padding
+            h += 2 * padding
+            if x + w > width:
+                # New shelf
+                x, y = 0, y + shelfHeight
+                shelfHeight = 0
+            positions[name] = (x + padding, y + padding)
+            x += w
+            shelfHeight = max(shelfHeight, h)
+        height = y + shelfHeight
+
+        self.image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        for name, (px, py) in positions.items():
+            im = loaded[name]
+            self.image.paste(im, (px, py))
+            w, h = im.size
+            self.regions[name] = (px / width, py / height, (px + w) / width, (py + h) / height)
+
+    @staticmethod
+    def fromDirectory(directory, extension=".png", **kwargs):
+        """
+        Atlas with every image of a directory, named after its file without extension
+        """
+        images = {}
+        for fileName in sorted(os.listdir(directory)):
+            if fileName.endswith(extension):
+                images[fileName[:-len(extension)]] = os.path.join(directory, fileName)
+        return TextureAtlas(images, **kwargs)
+
+    def region(self, name):
+        return self.regions[name]
+
+    def remap(self, vertices, name, stride=5, offset=3):
+        """
+        Returns a copy of an interleaved vertex list whose texture coordinates,
+        originally in [0, 1], are moved into the region of the named image.
+        By default vertices are (x, y, z, s, t) as in the textured basic shapes.
+        """
+        u0, v0, u1, v1 = self.regions[name]
+        data = np.array(vertices, dtype=np.float32).reshape(-1, stride)
+        data[:, offset] = u0 + data[:, offset] * (u1 - u0)
+        data[:, offset + 1] = v0 + data[:, offset + 1] * (v1 - v0)
+        return data.reshape(-1)
+
+    def upload(self, minFilterMode=GL_NEAREST, maxFilterMode=GL_NEAREST):
+        """
+        Creates the GL texture with the atlas image, only once
+        """
+        if self.texture is not None:
+            return self.texture
+
+        self.texture = glGenTextures(1)
+        gls.state.bindTexture(self.texture)
+
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, minFilterMode)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, maxFilterMode)
+
+        imgData = np.array(self.image, np.uint8)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, self.image.size[0], self.image.size[1], 0, GL_RGBA, GL_UNSIGNED_BYTE, imgData)
+        return self.texture
+
+    def clear(self):
+        """Freeing GPU memory"""
+        if self.texture is not None:
+            gls.state.deleteTexture(self.texture)
+            self.texture = None
@@ -113,6 +113,85 @@ def matmul(mats):
     return out
 
 
+# Batched versions: each parameter is a scalar or an array of N values, and the
+# result is a (N, 4, 4) stack with one matrix per entity. If out is given, it must
+# be a (N, 4, 4) array and the matrices are written there instead of a new array.
+
+def _stack(n, out):
+    if out is None:
+        out = np.empty((n, 4, 4), dtype=np.float32)
+    out[...] = 0
+    out[:, 3, 3] = 1
+    return out
+
+
+def _count(*params):
+    # N is the length of the array parameters; scalars are shared by every entity
+    sizes = [len(p) for p in params if np.ndim(p) > 0]
+    return max(sizes) if sizes else 1
+
+
+def identityN(n, out=None):
+    out = _stack(n, out)
+    out[:, 0, 0] = 1
+    out[:, 1, 1] = 1
+    out[:, 2, 2] = 1
+    return out
+
+
+def uniformScaleN(s, out=None):
+    out = _stack(_count(s), out)
+    out[:, 0, 0] = s
+    out[:, 1, 1] = s
+    out[:, 2, 2] = s
+    return out
+
+
+def scaleN(sx, sy, sz, out=None):
+    out = _stack(_count(sx, sy, sz), out)
+    out[:, 0, 0] = sx
+    out[:, 1, 1] = sy
+    out[:, 2, 2] = sz
+    return out
+
+
+def rotationZN(theta, out=None):
+    out = _stack(_count(theta), out)
+    sin_theta = np.sin(theta)
+    cos_theta = np.cos(theta)
+    out[:, 0, 0] = cos_theta
+    out[:, 0, 1] = -sin_theta
+    out[:, 1, 0] = sin_theta
+    out[:, 1, 1] = cos_theta
+    out[:, 2, 2] = 1
+    return out
+
+
+def translateN(tx, ty, tz, out=None):
+    out = identityN(_count(tx, ty, tz), out)
+    out[:, 0, 3] = tx
+    out[:, 1, 3] = ty
+    out[:, 2, 3] = tz
+    return out
+
+
+def matmulN(mats, out=None):
+    # Each element is a (N, 4, 4) stack or a single (4, 4) matrix shared by all entities
+    if len(mats) == 1:
+        if out is None:
+            return np.array(mats[0], dtype=np.float32)
+        out[...] = mats[0]
+        return out
+
+    result = mats[0]
+    for i in range(1, len(mats) - 1):
+        result = np.matmul(result, mats[i])
+
+    if out is None:
+        return np.matmul(result, mats[-1]).astype(np.float32, copy=False)
+    return np.matmul(result, mats[-1], out=out)
+
+
 def frustum(left, right, bottom, top, near, far):
     r_l = right - left
     t_b = top - bottom
@@ -0,0 +1,81 @@
+""" Registro de metricas por tick de la simulacion, escrito a disco en segundo plano """
+
+import os
+import queue
+import threading
+import numpy as np
+
+
+# Columnas del archivo de metricas
+COLUMNAS = ("tick", "tiempo", "humanos", "infectados", "zombies",
+            "spawns", "despawns", "conversiones", "chequeos")
+
+# Formato de cada columna en el CSV
+FORMATOS = ["%d", "%.6f", "%d", "%d", "%d", "%d", "%d", "%d", "%d"]
+
+
+class MetricsWriter():
+    # Escritor de metricas por tick a un CSV de solo agregado. Las filas se acumulan en un
+    # bloque de NumPy en memoria; cuando el bloque se llena se entrega a un hilo en segundo
+    # plano que lo escribe, de modo que el disco nunca se toca desde el ciclo del juego.
+    def __init__(self, ruta, filasPorBloque=4096):
+        self.ruta = ruta
+        self.filasPorBloque = filasPorBloque
+        self.bloque = np.empty((filasPorBloque, len(COLUMNAS)))
+        self.fila = 0 # Filas ocupadas del bloque actual
+        self.cola = queue.Queue() # Bloques llenos, pendientes de escribir
+
+        # Solo se escribe el encabezado si el archivo es nuevo
+        nuevo = not os.path.exists(ruta) or os.path.getsize(ruta) == 0
+        self.archivo = open(ruta, "a")
+        if nuevo:
+            self.archivo.write(",".join(COLUMNAS) + "\n")
+            self.archivo.flush()
+
+        self.hilo = threading.Thread(target=self._escribir, daemon=True)
+        self.hilo.start()
+
+    def registrar(self, tick, tiempo, humanos, infectados, zombies, spawns, despawns, conversiones, chequeos):
+        # Se agrega una fila al bloque actual; no hace entrada/salida
+        fila = self.bloque[self.fila]
+        fila[0] = tick
+        fila[1] = tiempo
+        fila[2] = humanos
+        fila[3] = infectados
+        fila[4] = zombies
+        fila[5] = spawns
+        fila[6] = despawns
+        fila[7] = conversiones
+        fila[8] = chequeos
+        self.fila += 1
+        if self.fila == self.filasPorBloque:
+            self.enviar()
+
+    def enviar(self):
+        # Se entrega el bloque actual al hilo escritor y se empieza uno nuevo
+        if self.fila > 0:
+            self.cola.put(self.bloque[:self.fila])
+            self.bloque = np.empty((self.filasPorBloque, len(COLUMNAS)))
+            self.fila = 0
+
+    def _escribir(self):
+        # Hilo escritor: agrega al archivo cada bloque recibido, hasta recibir None
+        while True:
+            bloque = self.cola.get()
+            if bloque is None:
+                break
+            np.savetxt(self.archivo, bloque, fmt=FORMATOS, delimiter=",")
+            self.archivo.flush()
+
+    def cerrar(self):
+        # Se escriben las filas pendientes y se cierra el archivo
+        self.enviar()
+        self.cola.put(None)
+        self.hilo.join()
+        self.archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
@@ -1,10 +1,21 @@
 """ Clases usadas en el programa"""
 
-import glfw
 import numpy as np
 import grafica.transformations as tr
 from random import *
 
+class Controller():
+    # Clase controlador con variables para manejar el estado de ciertos botones
+    def __init__(self):
+        self.fillPolygon = True
+        self.is_w_pressed = False
+        self.is_s_pressed = False
+        self.is_a_pressed = False
+        self.is_d_pressed = False
+        self.scan = False
+
+###################################################################################
+
 class Player():
     # Clase que contiene al modelo del player / auro
     def __init__(self, size):
@@ -42,27 +53,38 @@ class Player():
             self.pos[1] -= self.vel[1] * delta
 
         # Se le aplica la transformacion de traslado segun la posicion actual
-        self.model.transform = tr.matmul([tr.translate(self.pos[0], self.pos[1], 0), tr.scale(self.size, self.size, 1)])
+        if self.model is not None:
+            self.model.transform = tr.matmul([tr.translate(self.pos[0], self.pos[1], 0), tr.scale(self.size, self.size, 1)])
 
-    def collision(self, npcs):
+    def collision(self, npcs, grid=None):
         # Funcion para detectar las colisiones con zombies
 
+        # Si se entrega una grilla, solo se revisan los npcs de las celdas cercanas
+        if grid is not None:
+            npcs = grid.query(self.pos[0], self.pos[1])
+
         # Se recorren los npcs
         for npc in npcs:
             if npc.eszombie == 1: # Solo se ejecuta para zombies
                 # si la distancia al npc es menor que la suma de los radios ha ocurrido en la colision
-                if (self.radio+npc.radio)**2 > ((self.pos[0]- npc.mov[npc.posA][0])**2 + (self.pos[1]-npc.mov[npc.posA][1])**2):
+                x, y = npc.posicion()
+                if (self.radio+npc.radio)**2 > ((self.pos[0]- x)**2 + (self.pos[1]- y)**2):
                     return True
 
 
-    def contagio(self, npcs):
+    def contagio(self, npcs, grid=None):
         # Funcion para detectar las colisiones con humanos contagiados
 
+        # Si se entrega una grilla, solo se revisan los npcs de las celdas cercanas
+        if grid is not None:
+            npcs = grid.query(self.pos[0], self.pos[1])
+
         # Se recorren los npcs
         for npc in npcs:
             if npc.infectado == 1: # Solo se ejecuta para infectados
                 # si la distancia al npc es menor que la suma de los radios ha ocurrido en la colision
-                if (self.radio+npc.radio)**2 > ((self.pos[0]- npc.mov[npc.posA][0])**2 + (self.pos[1]-npc.mov[npc.posA][1])**2):
+                x, y = npc.posicion()
+                if (self.radio+npc.radio)**2 > ((self.pos[0]- x)**2 + (self.pos[1]- y)**2):
                     self.infectado = True
 
     
@@ -91,7 +113,8 @@ class NPC():
         self.infectado = 0 # Indicador de si está infectado o no
         self.nombre = "" # Nombre que se le otorgara al nodo para poder ser encontrado
         self.vel = 0 # Cantidad total de puntos que tiene la curva asignada, directamente proporcional a la velocidad del npc
-        self.mov = [] # Vectores que corresponderan a la curva que sigue el npc
+        self.curva = None # Matriz (3x4) de la curva de Hermite o Bezier que sigue el npc
+        self.camino = None # Opcional: puntos (vel, 2) precalculados de la curva, en vez de la matriz
         self.radio = 0.04 # Distancia para realizar los calculos de colision
         self.size = size # Escala a aplicar al nodo
         self.model = None # Referencia al grafo de escena asociado
@@ -100,35 +123,132 @@ class NPC():
         # Se obtiene una referencia a uno nodo
         self.model = new_model
 
+    def posicion(self):
+        # Se retorna la posicion (x, y) actual del npc, evaluando su curva en el punto posA
+        # de los vel puntos repartidos entre t=0 y t=1
+        if self.camino is not None:
+            return self.camino[self.posA][0], self.camino[self.posA][1]
+        t = self.posA / (self.vel - 1) if self.vel > 1 else 0.0
+        M = self.curva
+        x = M[0][0] + t * (M[0][1] + t * (M[0][2] + t * M[0][3]))
+        y = M[1][0] + t * (M[1][1] + t * (M[1][2] + t * M[1][3]))
+        return x, y
+
     def update(self):
         # Se posiciona el nodo referenciado
-        self.model.transform = tr.matmul([tr.translate(self.mov[self.posA][0], self.mov[self.posA][1], 0), tr.scale(self.size, self.size, 1)])
+        x, y = self.posicion()
+        if self.model is not None:
+            self.model.transform = tr.matmul([tr.translate(x, y, 0), tr.scale(self.size, self.size, 1)])
 
     def conversion(self, prob):
         # Se convierte, con cierta probabilidad, de humano a zombie
         convertir = uniform(0.0,1.0)
-        if prob >= convertir and self.mov[self.posA][1] <= 0.9:
+        if prob >= convertir and self.posicion()[1] <= 0.9:
             return True
 
-    def collision(self, lista):
+    def collision(self, lista, grid=None):
         # Funcion para detectar las colisiones entre npcs
 
+        x, y = self.posicion()
+
+        # Si se entrega una grilla, solo se revisan los npcs de las celdas cercanas
+        if grid is not None:
+            lista = grid.query(x, y)
+
         # Se recorren los npcs
         for b in lista:
             # si la distancia al npc es menor que la suma de los radios ha ocurrido en la colision
             if b.eszombie == 1 and self.nombre != b.nombre:
-                if (self.radio+b.radio)**2 > ((self.mov[self.posA][0] - b.mov[b.posA][0])**2 + (self.mov[self.posA][1] - b.mov[b.posA][1])**2):
+                bx, by = b.posicion()
+                if (self.radio+b.radio)**2 > ((x - bx)**2 + (y - by)**2):
                     return True
 
-    def collisionI(self, lista):
+    def collisionI(self, lista, grid=None):
         # Funcion para detectar las colisiones entre npcs infecados y sanos
 
+        x, y = self.posicion()
+
+        # Si se entrega una grilla, solo se revisan los npcs de las celdas cercanas
+        if grid is not None:
+            lista = grid.query(x, y)
+
         # Se recorren los npcs
         for b in lista:
             # si la distancia al npc es menor que la suma de los radios ha ocurrido en la colision
             if b.infectado == 1 and self.nombre != b.nombre:
-                if (self.radio+b.radio)**2 > ((self.mov[self.posA][0] - b.mov[b.posA][0])**2 + (self.mov[self.posA][1] - b.mov[b.posA][1])**2):
+                bx, by = b.posicion()
+                if (self.radio+b.radio)**2 > ((x - bx)**2 + (y - by)**2):
                     return True
 
+###################################################################################
 
-    
+def _campo(nombre):
+    # Propiedad que lee y escribe un campo de la poblacion en el slot de la vista
+    def leer(self):
+        if self.poblacion is None:
+            return self.datos[nombre]
+        return getattr(self.poblacion, nombre)[self.slot]
+
+    def escribir(self, valor):
+        if self.poblacion is None:
+            self.datos[nombre] = valor
+        else:
+            getattr(self.poblacion, nombre)[self.slot] = valor
+
+    return property(leer, escribir)
+
+
+class NPCVista(NPC):
+    # Vista de un npc guardado en una Population. Expone los mismos atributos que NPC,
+    # pero leyendo y escribiendo directamente en los arreglos de la poblacion
+    posA = _campo("posA")
+    posS = _campo("posS")
+    vel = _campo("vel")
+    eszombie = _campo("eszombie")
+    infectado = _campo("infectado")
+    radio = _campo("radio")
+    size = _campo("size")
+    curva = _campo("curva")
+    fila = _campo("fila")
+    nombre = _campo("nombre")
+    model = None # Las vistas no tienen nodo propio: el renderer posiciona a los npcs en lote
+
+    def __init__(self, poblacion, slot):
+        self.poblacion = poblacion # Poblacion que contiene los datos del npc
+        self.slot = slot # Indice del npc dentro de la poblacion
+        self.datos = None # Copia de los datos cuando el npc ya no esta en la poblacion
+
+    @property
+    def camino(self):
+        # Vista (sin copia) del camino precalculado en el banco de curvas, si el npc sigue uno
+        if self.poblacion is None or self.poblacion.banco is None or self.fila < 0:
+            return None
+        return self.poblacion.banco.camino(self.vel, self.fila)
+
+    def posicion(self):
+        # La posicion actual se lee de los arreglos de la poblacion
+        if self.poblacion is None:
+            return self.datos["x"], self.datos["y"]
+        return self.poblacion.x[self.slot], self.poblacion.y[self.slot]
+
+    def ligar(self, poblacion, slot):
+        # Se asocia la vista (posiblemente reciclada) a un slot de una poblacion
+        self.poblacion = poblacion
+        self.slot = slot
+
+    def desligar(self, copiar=True):
+        # Se copian los datos de la vista, pues su slot sera ocupado por otro npc.
+        # Con copiar=False la vista solo se suelta (por ejemplo, para devolverla a la reserva)
+        # y ya no se puede leer
+        if not copiar:
+            self.poblacion = None
+            self.datos = None
+            return
+        if self.datos is None:
+            self.datos = {}
+        for campo in ("posA", "posS", "vel", "eszombie", "infectado", "radio", "size", "x", "y", "curva", "fila", "nombre"):
+            valor = getattr(self.poblacion, campo)[self.slot]
+            if isinstance(valor, np.ndarray):
+                valor = valor.copy()
+            self.datos[campo] = valor
+        self.poblacion = None
@@ -0,0 +1,53 @@
+""" Reserva de objetos reutilizables para evitar asignaciones en cada spawn """
+
+
+class Pool():
+    # Reserva de objetos con lista libre. Los objetos liberados se guardan (hasta un limite)
+    # para ser entregados de nuevo en vez de crear otros, de modo que en regimen estable
+    # el spawn de npcs casi no asigne memoria.
+    def __init__(self, crear, limite=None):
+        self.crear = crear # Funcion sin argumentos que crea un objeto nuevo
+        self.limite = limite # Cantidad maxima de objetos libres guardados (None = sin limite)
+        self.libres = [] # Lista libre
+
+        # Estadisticas
+        self.creados = 0 # Objetos creados con crear()
+        self.reutilizados = 0 # Objetos entregados desde la lista libre
+        self.descartados = 0 # Objetos liberados que no cupieron en la lista libre
+        self.enUso = 0 # Objetos entregados y aun no liberados
+        self.maximoEnUso = 0 # Maximo historico de objetos en uso (high-water mark)
+
+    def obtener(self):
+        # Se entrega un objeto libre, o uno nuevo si no quedan
+        if self.libres:
+            objeto = self.libres.pop()
+            self.reutilizados += 1
+        else:
+            objeto = self.crear()
+            self.creados += 1
+
+        self.enUso += 1
+        if self.enUso > self.maximoEnUso:
+            self.maximoEnUso = self.enUso
+        return objeto
+
+    def liberar(self, objeto):
+        # Se devuelve un objeto a la reserva
+        self.enUso -= 1
+        if self.limite is None or len(self.libres) < self.limite:
+            self.libres.append(objeto)
+        else:
+            self.descartados += 1
+
+    def estadisticas(self):
+        # Se retorna un resumen del uso de la reserva
+        return {
+            "creados": self.creados,
+            "reutilizados": self.reutilizados,
+            "descartados": self.descartados,
+            "enUso": self.enUso,
+            "maximoEnUso": self.maximoEnUso,
+            "libres": len(self.libres)}
+
+    def __len__(self):
+        return len(self.libres)
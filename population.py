@@ -0,0 +1,219 @@
+""" Almacenamiento de la poblacion de npcs como estructura de arreglos (NumPy) """
+
+import numpy as np
+import grafica.transformations as tr
+from model import NPCVista
+from pool import Pool
+
+
+# Campos de la poblacion guardados como arreglos de NumPy
+CAMPOS = ("posA", "posS", "vel", "eszombie", "infectado", "radio", "size", "x", "y", "curva", "fila")
+
+
+class Population():
+    # Contenedor de npcs donde cada campo vive en un arreglo contiguo indexado por slot.
+    # Los npcs activos ocupan los slots [0, n); el avance de posicion, la actualizacion de
+    # las banderas de infeccion y el despawn se hacen como operaciones sobre todo el arreglo.
+    def __init__(self, capacidad=64, limitePool=None, banco=None):
+        self.n = 0 # Cantidad de npcs activos
+        self.capacidad = capacidad
+        self.banco = banco # Banco de curvas precalculadas (CurveBank) opcional
+
+        self.posA = np.zeros(capacidad, dtype=np.int64) # Indicador del vector con la posicion del npc
+        self.posS = np.zeros(capacidad, dtype=np.int64) # Vector siguiente
+        self.vel = np.zeros(capacidad, dtype=np.int64) # Cantidad total de puntos de la curva
+        self.eszombie = np.zeros(capacidad, dtype=np.int8) # Indicador de si es zombie o humano
+        self.infectado = np.zeros(capacidad, dtype=np.int8) # Indicador de si esta infectado o no
+        self.radio = np.zeros(capacidad, dtype=np.float64) # Distancia para los calculos de colision
+        self.size = np.zeros(capacidad, dtype=np.float64) # Escala a aplicar al nodo
+        self.x = np.zeros(capacidad, dtype=np.float64) # Posicion actual (x) sobre la curva
+        self.y = np.zeros(capacidad, dtype=np.float64) # Posicion actual (y) sobre la curva
+        self.curva = np.zeros((capacidad, 3, 4), dtype=np.float64) # Matriz de la curva que sigue cada npc
+        self.fila = np.full(capacidad, -1, dtype=np.int64) # Fila de la curva en el banco (-1 = curva analitica)
+
+        self.nombre = [] # Nombre del nodo asociado a cada npc
+        self.vistas = [] # Vista por entidad, compatible con la clase NPC
+        self.registros = Pool(lambda: NPCVista(None, 0), limitePool) # Vistas recicladas
+
+    def _crecer(self):
+        # Se duplica la capacidad de los arreglos
+        self.capacidad *= 2
+        for campo in CAMPOS:
+            viejo = getattr(self, campo)
+            nuevo = np.zeros((self.capacidad,) + viejo.shape[1:], dtype=viejo.dtype)
+            nuevo[:self.n] = viejo[:self.n]
+            setattr(self, campo, nuevo)
+
+    def agregar(self, curva, vel, eszombie, infectado=0, size=0.08, nombre=""):
+        # Se agrega un npc que recorre los vel puntos de la curva dada y se retorna su vista
+        if self.n == self.capacidad:
+            self._crecer()
+
+        i = self.n
+        self.posA[i] = 0
+        self.posS[i] = 1
+        self.vel[i] = vel
+        self.eszombie[i] = eszombie
+        self.infectado[i] = infectado
+        self.radio[i] = 0.04
+        self.size[i] = size
+        self.curva[i] = curva
+        self.fila[i] = -1
+        self.x[i] = curva[0][0]
+        self.y[i] = curva[1][0]
+
+        self.nombre.append(nombre)
+        vista = self.registros.obtener()
+        vista.ligar(self, i)
+        self.vistas.append(vista)
+
+        self.n += 1
+        return vista
+
+    def agregarLote(self, curvas, vels, eszombie, infectado, size=0.08, nombres=None, filas=None):
+        # Se agregan K npcs de una vez; curvas es (K, 3, 4) y el resto son arreglos de K valores.
+        # Si se entregan filas, los npcs siguen esas curvas del banco en vez de curvas analiticas.
+        # Se retornan sus vistas
+        k = len(curvas)
+        while self.n + k > self.capacidad:
+            self._crecer()
+
+        i, j = self.n, self.n + k
+        self.posA[i:j] = 0
+        self.posS[i:j] = 1
+        self.vel[i:j] = vels
+        self.eszombie[i:j] = eszombie
+        self.infectado[i:j] = infectado
+        self.radio[i:j] = 0.04
+        self.size[i:j] = size
+        self.curva[i:j] = curvas
+        if filas is None:
+            self.fila[i:j] = -1
+            self.x[i:j] = curvas[:, 0, 0]
+            self.y[i:j] = curvas[:, 1, 0]
+        else:
+            self.fila[i:j] = filas
+            self.x[i:j], self.y[i:j] = self.banco.posiciones(self.vel[i:j], self.fila[i:j], self.posA[i:j])
+
+        if nombres is None:
+            nombres = [""] * k
+        self.nombre += nombres
+        nuevas = []
+        for slot in range(i, j):
+            vista = self.registros.obtener()
+            vista.ligar(self, slot)
+            nuevas.append(vista)
+        self.vistas += nuevas
+
+        self.n = j
+        return nuevas
+
+    def __len__(self):
+        return self.n
+
+    def actualizarPosiciones(self):
+        # Se evaluan las curvas de todos los npcs en su punto actual, t = posA / (vel - 1)
+        n = self.n
+        t = self.posA[:n] / np.maximum(self.vel[:n] - 1, 1)
+        M = self.curva[:n]
+        self.x[:n] = M[:, 0, 0] + t * (M[:, 0, 1] + t * (M[:, 0, 2] + t * M[:, 0, 3]))
+        self.y[:n] = M[:, 1, 0] + t * (M[:, 1, 1] + t * (M[:, 1, 2] + t * M[:, 1, 3]))
+
+        # Los npcs que siguen curvas del banco leen su posicion directamente de el
+        if self.banco is not None:
+            enBanco = np.flatnonzero(self.fila[:n] >= 0)
+            if len(enBanco) > 0:
+                self.x[enBanco], self.y[enBanco] = self.banco.posiciones(self.vel[enBanco], self.fila[enBanco], self.posA[enBanco])
+
+    def limpiarZombies(self):
+        # Los zombies nunca quedan marcados como infectados
+        n = self.n
+        self.infectado[:n][self.eszombie[:n] == 1] = 0
+
+    def convertir(self, prob):
+        # Los infectados se convierten, con cierta probabilidad, de humano a zombie.
+        # Se retornan las vistas de los npcs convertidos
+        n = self.n
+        sorteo = np.random.uniform(0.0, 1.0, n)
+        mascara = (self.infectado[:n] == 1) & (prob >= sorteo) & (self.y[:n] <= 0.9)
+        self.infectado[:n][mascara] = 0
+        self.eszombie[:n][mascara] = 1
+        return [self.vistas[i] for i in np.flatnonzero(mascara)]
+
+    def quitar(self, mascara, copiar=True):
+        # Se quitan los npcs indicados por la mascara. Se retornan las vistas de los npcs quitados
+        return self.quitarSlots(np.flatnonzero(mascara), copiar)
+
+    def quitarSlots(self, slots, copiar=True):
+        # Se quitan los npcs de los slots indicados, rellenando cada hueco con uno de los
+        # ultimos npcs activos (swap-remove). Quitar K npcs cuesta O(K) y solo cambia el
+        # slot de los npcs movidos; sus vistas se actualizan para seguir siendo validas.
+        # Se retornan las vistas de los npcs quitados; con copiar=True guardan una copia de
+        # sus datos, si no quedan sueltas (sin asignar memoria), listas para volver a la reserva
+        k = len(slots)
+        if k == 0:
+            return []
+
+        n = self.n
+        m = n - k
+
+        # Las vistas quitadas se desligan de la poblacion antes de mover los datos
+        vistas = [self.vistas[i] for i in slots]
+        for vista in vistas:
+            vista.desligar(copiar)
+
+        # Huecos que quedan dentro de [0, m) y npcs sobrevivientes en [m, n) que los ocuparan
+        quitado = np.zeros(k, dtype=bool)
+        cola = np.arange(m, n)
+        quitado[np.searchsorted(cola, slots[slots >= m])] = True
+        huecos = slots[slots < m]
+        movidos = cola[~quitado]
+
+        for campo in CAMPOS:
+            arreglo = getattr(self, campo)
+            arreglo[huecos] = arreglo[movidos]
+
+        for hueco, movido in zip(huecos.tolist(), movidos.tolist()):
+            self.nombre[hueco] = self.nombre[movido]
+            vista = self.vistas[movido]
+            vista.slot = hueco
+            self.vistas[hueco] = vista
+
+        del self.nombre[m:]
+        del self.vistas[m:]
+
+        self.n = m
+        return vistas
+
+    def transformaciones(self, out=None):
+        # Transformaciones (n, 4, 4) de todos los npcs activos, trasladados a su posicion y
+        # escalados segun su tamaño, como en NPC.update pero en una sola operacion.
+        # out opcional: arreglo (n, 4, 4) float32 reutilizado entre frames. Como trasladar
+        # despues de escalar solo agrega la columna de traslacion, se escriben directamente
+        # en out, sin matrices intermedias
+        n = self.n
+        out = tr.scaleN(self.size[:n], self.size[:n], 1, out)
+        out[:, 0, 3] = self.x[:n]
+        out[:, 1, 3] = self.y[:n]
+        return out
+
+    def liberar(self, vistas):
+        # Se devuelven a la reserva las vistas de npcs ya quitados, una vez que nadie las usa
+        for vista in vistas:
+            self.registros.liberar(vista)
+
+    def terminados(self):
+        # Se avanza el indice de posicion de cada npc y se retornan los slots de los que
+        # alcanzaron su ultima posicion. Las posiciones (x, y) aun no se actualizan
+        n = self.n
+        self.posA[:n] += 1
+        self.posS[:n] += 1
+        return np.flatnonzero(self.posS[:n] == self.vel[:n] + 1)
+
+    def avanzar(self, copiar=True):
+        # Se le asigna una nueva posicion a cada npc; los que alcanzan su ultima posicion
+        # se quitan de la poblacion. Se retornan las vistas de los npcs quitados
+        # Los despawn se hacen en lote al final del tick
+        quitados = self.quitarSlots(self.terminados(), copiar)
+        self.actualizarPosiciones()
+        return quitados
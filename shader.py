@@ -9,6 +9,8 @@ from PIL import Image
 import grafica.gpu_shape as gs
 import grafica.transformations as tr
 import grafica.basic_shapes as bs
+import grafica.gl_state as gls
+import grafica.program_cache as pc
 from grafica.gpu_shape import GPUShape
 from grafica.scene_graph import *
 
@@ -50,12 +52,11 @@ class BirdShaderProgram:
             }
             """
 
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, OpenGL.GL.GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, OpenGL.GL.GL_FRAGMENT_SHADER))
+        self.shaderProgram = pc.compileProgram(vertex_shader, fragment_shader)
+        gls.state.resolveUniforms(self.shaderProgram)
 
     def setupVAO(self, gpuShape):
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
 
         glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
@@ -70,281 +71,12 @@ class BirdShaderProgram:
         glEnableVertexAttribArray(color)
 
         # Unbinding current vao
-        glBindVertexArray(0)
+        gls.state.bindVertexArray(0)
 
 
     def drawCall(self, gpuShape, mode=GL_TRIANGLES):
         assert isinstance(gpuShape, GPUShape)
 
         # Binding the VAO and executing the draw call
-        glBindVertexArray(gpuShape.vao)
+        gls.state.bindVertexArray(gpuShape.vao)
         glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
-        
-        # Unbind the current VAO
-        glBindVertexArray(0)
-
-class ScannerShader:
-
-    def __init__(self):
-
-        vertex_shader = """
-            #version 130
-
-            uniform mat4 transform;
-
-            in vec3 position;
-            in vec2 texCoords;
-
-            out vec2 outTexCoords;
-
-            void main()
-            {
-                gl_Position = transform * vec4(position, 1.0f);
-                outTexCoords = texCoords;
-            }
-            """
-
-        fragment_shader = """
-            #version 130
-
-            in vec2 outTexCoords;
-
-            out vec4 outColor;
-
-            uniform sampler2D samplerTex;
-
-            void main()
-            {
-                vec4 modColor = vec4(0.1,1,0.1,1.0f);
-                outColor = texture(samplerTex, outTexCoords)*modColor;
-            }
-            """
-
-        # Compiling our shader program
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
-
-
-    def setupVAO(self, gpuShape):
-
-        glBindVertexArray(gpuShape.vao)
-
-        glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
-
-        # 3d vertices + 2d texture coordinates => 3*4 + 2*4 = 20 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
-        
-        texCoords = glGetAttribLocation(self.shaderProgram, "texCoords")
-        glVertexAttribPointer(texCoords, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(3 * SIZE_IN_BYTES))
-        glEnableVertexAttribArray(texCoords)
-
-        # Unbinding current vao
-        glBindVertexArray(0)
-
-
-    def drawCall(self, gpuShape, mode=GL_TRIANGLES):
-        assert isinstance(gpuShape, GPUShape)
-
-        glBindVertexArray(gpuShape.vao)
-        glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
-        glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
-
-        # Unbind the current VAO
-        glBindVertexArray(0)
-
-
-class PlayerShader:
-
-    def __init__(self):
-
-        vertex_shader = """
-            #version 130
-
-            uniform mat4 transform;
-
-            in vec3 position;
-            in vec2 texCoords;
-
-            out vec2 outTexCoords;
-
-            void main()
-            {
-                gl_Position = transform * vec4(position, 1.0f);
-                outTexCoords = texCoords;
-            }
-            """
-
-        fragment_shader = """
-            #version 130
-
-            in vec2 outTexCoords;
-
-            uniform float clr;
-            
-            out vec4 outColor;
-
-            uniform sampler2D samplerTex;
-
-            void main()
-            {
-                vec4 modColor = vec4(clr,1-clr,1-clr,1.0f);
-                outColor = texture(samplerTex, outTexCoords)*modColor;
-            }
-            """
-
-        # Compiling our shader program
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
-
-
-    def setupVAO(self, gpuShape):
-
-        glBindVertexArray(gpuShape.vao)
-
-        glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
-
-        # 3d vertices + 2d texture coordinates => 3*4 + 2*4 = 20 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
-        
-        texCoords = glGetAttribLocation(self.shaderProgram, "texCoords")
-        glVertexAttribPointer(texCoords, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(3 * SIZE_IN_BYTES))
-        glEnableVertexAttribArray(texCoords)
-
-        # Unbinding current vao
-        glBindVertexArray(0)
-
-
-    def drawCall(self, gpuShape, mode=GL_TRIANGLES):
-        assert isinstance(gpuShape, GPUShape)
-
-        glBindVertexArray(gpuShape.vao)
-        glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
-        glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
-
-        # Unbind the current VAO
-        glBindVertexArray(0)
-
-class FadingShader:
-
-    def __init__(self):
-
-        vertex_shader = """
-            #version 130
-
-            uniform mat4 transform;
-
-            in vec3 position;
-            in vec2 texCoords;
-
-            out vec2 outTexCoords;
-
-            void main()
-            {
-                gl_Position = transform * vec4(position, 1.0f);
-                outTexCoords = texCoords;
-            }
-            """
-
-        fragment_shader = """
-            #version 130
-
-            in vec2 outTexCoords;
-
-            uniform float fade;
-
-            out vec4 outColor;
-
-            uniform sampler2D samplerTex;
-
-            void main()
-            {
-                vec4 modColor = vec4(1,1,1,fade);
-                outColor = texture(samplerTex, outTexCoords)*modColor;
-            }
-            """
-
-        # Compiling our shader program
-        self.shaderProgram = OpenGL.GL.shaders.compileProgram(
-            OpenGL.GL.shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
-            OpenGL.GL.shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER))
-
-
-    def setupVAO(self, gpuShape):
-
-        glBindVertexArray(gpuShape.vao)
-
-        glBindBuffer(GL_ARRAY_BUFFER, gpuShape.vbo)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, gpuShape.ebo)
-
-        # 3d vertices + 2d texture coordinates => 3*4 + 2*4 = 20 bytes
-        position = glGetAttribLocation(self.shaderProgram, "position")
-        glVertexAttribPointer(position, 3, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(0))
-        glEnableVertexAttribArray(position)
-        
-        texCoords = glGetAttribLocation(self.shaderProgram, "texCoords")
-        glVertexAttribPointer(texCoords, 2, GL_FLOAT, GL_FALSE, 20, ctypes.c_void_p(3 * SIZE_IN_BYTES))
-        glEnableVertexAttribArray(texCoords)
-
-        # Unbinding current vao
-        glBindVertexArray(0)
-
-
-    def drawCall(self, gpuShape, mode=GL_TRIANGLES):
-        assert isinstance(gpuShape, GPUShape)
-
-        glBindVertexArray(gpuShape.vao)
-        glBindTexture(GL_TEXTURE_2D, gpuShape.texture)
-        glDrawElements(mode, gpuShape.size, GL_UNSIGNED_INT, None)
-
-        # Unbind the current VAO
-        glBindVertexArray(0)
-
-
-def drawSceneGraphNodeF(node, pipeline, transformName, fade, parentTransform=tr.identity()):
-    assert(isinstance(node, SceneGraphNode))
-
-    # Composing the transformations through this path
-    newTransform = np.matmul(parentTransform, node.transform)
-
-    # If the child node is a leaf, it should be a GPUShape.
-    # Hence, it can be drawn with drawCall
-    if len(node.childs) == 1 and isinstance(node.childs[0], gs.GPUShape):
-        leaf = node.childs[0]
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, transformName), 1, GL_TRUE, newTransform)
-        glUniform1f(glGetUniformLocation(pipeline.shaderProgram, "fade"), fade)
-        pipeline.drawCall(leaf)
-
-    # If the child node is not a leaf, it MUST be a SceneGraphNode,
-    # so this draw function is called recursively
-    else:
-        for child in node.childs:
-            drawSceneGraphNodeF(child, pipeline, transformName, fade, newTransform)
-
-def drawHinataScan(node, pipeline, transformName, clr, parentTransform=tr.identity()):
-    assert(isinstance(node, SceneGraphNode))
-
-    # Composing the transformations through this path
-    newTransform = np.matmul(parentTransform, node.transform)
-
-    # If the child node is a leaf, it should be a GPUShape.
-    # Hence, it can be drawn with drawCall
-    if len(node.childs) == 1 and isinstance(node.childs[0], gs.GPUShape):
-        leaf = node.childs[0]
-        glUniformMatrix4fv(glGetUniformLocation(pipeline.shaderProgram, transformName), 1, GL_TRUE, newTransform)
-        glUniform1f(glGetUniformLocation(pipeline.shaderProgram, "clr"), clr)
-        pipeline.drawCall(leaf)
-
-    # If the child node is not a leaf, it MUST be a SceneGraphNode,
-    # so this draw function is called recursively
-    else:
-        for child in node.childs:
-            drawHinataScan(child, pipeline, transformName, clr, newTransform)
-
@@ -9,6 +9,7 @@ import grafica.easy_shaders as es
 import grafica.transformations as tr
 import grafica.ex_curves as cv
 import grafica.scene_graph as sg
+from curves import hermiteRand, bezierRand, randomCurva
 from random import *
 
 # Definimos la clase shape para agrupar vertices e indices
@@ -25,13 +26,31 @@ def createGPUShape(shape, pipeline):
     gpuShape.fillBuffers(shape.vertices, shape.indices, GL_STATIC_DRAW)
     return gpuShape
 
-def createTextureGPUShape(shape, pipeline, path):
+def createTextureGPUShape(shape, pipeline, path, atlas=None):
     # Funcion Conveniente para facilitar la inicializacion de un GPUShape con texturas
+    # Si se entrega un atlas (TextureAtlas), path es el nombre de una de sus regiones:
+    # las coordenadas de textura se llevan a esa region y se usa la textura compartida del atlas
     gpuShape = es.GPUShape().initBuffers()
     pipeline.setupVAO(gpuShape)
+    if atlas is None:
+        gpuShape.fillBuffers(shape.vertices, shape.indices, GL_STATIC_DRAW)
+        gpuShape.texture = es.textureSimpleSetup(
+            path, GL_CLAMP_TO_EDGE, GL_CLAMP_TO_EDGE, GL_NEAREST, GL_NEAREST)
+    else:
+        gpuShape.fillBuffers(atlas.remap(shape.vertices, path), shape.indices, GL_STATIC_DRAW)
+        gpuShape.texture = atlas.upload()
+    return gpuShape
+
+def createInstancedTextureGPUShape(shape, pipeline, nombres, atlas):
+    # Funcion Conveniente para inicializar un GPUShape que se dibuja con instancias.
+    # Todos los sprites salen del atlas (TextureAtlas): el id de sprite de cada instancia
+    # es el indice de su region en nombres
+    assert len(nombres) <= pipeline.MAX_SPRITES
+    gpuShape = es.InstancedGPUShape().initBuffers()
+    pipeline.setupVAO(gpuShape)
     gpuShape.fillBuffers(shape.vertices, shape.indices, GL_STATIC_DRAW)
-    gpuShape.texture = es.textureSimpleSetup(
-        path, GL_CLAMP_TO_EDGE, GL_CLAMP_TO_EDGE, GL_NEAREST, GL_NEAREST)
+    gpuShape.regions = np.array([atlas.region(nombre) for nombre in nombres], dtype=np.float32)
+    gpuShape.texture = atlas.upload()
     return gpuShape
 
 ################################################################################### 
@@ -48,80 +67,6 @@ def createTexCuad(largo,alto,tx,ty):
     return Shape(vertices,indices)
 
 
-def hermiteRand(N):
-    # Funcion para generar una curva de Hermite de N puntos
-
-    # Puntos de Control
-    inicio = uniform(-0.5,0.5)
-    fin = uniform(-0.5,0.5)
-    x1 = uniform(-0.5,0.5)
-    x2 = uniform(-0.5,0.5)
-    y1 = uniform(-2.0,-1.0)
-    y2 = uniform(-2.0,-1.0)
-    
-    P0 = np.array([[inicio, 1.0, 0]]).T
-    P1 = np.array([[fin, -1.0, 0]]).T
-    T0 = np.array([[x1, y1, 0]]).T
-    T1 = np.array([[x2, y2, 0]]).T
-    # Matriz de Hermite
-    H_M = cv.hermiteMatrix(P0, P1, T0, T1)
-
-    # Arreglo de numeros entre 0 y 1
-    ts = np.linspace(0.0, 1.0, N)
-    
-    # The computed value in R3 for each sample will be stored here
-    curve = np.ndarray(shape=(len(ts), 3), dtype=float)
-    
-    # Se llenan los puntos de la curva
-    for i in range(len(ts)):
-        T = cv.generateT(ts[i])
-        curve[i, 0:3] = np.matmul(H_M, T).T
-        
-    return curve
-
-def bezierRand(N):
-    # Funcion para generar una curva de Bezier de N puntos
-
-    # Puntos de Control
-    inicio = uniform(-0.5,0.5)
-    fin = uniform(-0.5,0.5)
-    x1 = uniform(-0.5,0.5)
-    x2 = uniform(-0.5,0.5)
-    y1 = uniform(-1.0,1.0)
-    y2 = uniform(-1.0,1.0)
-    
-    P0 = np.array([[inicio, 1.0, 0]]).T
-    P1 = np.array([[x1, y1, 0]]).T
-    P2 = np.array([[x2, y2, 0]]).T
-    P3 = np.array([[fin, -1.0, 0]]).T
-    # Matrices de Hermite y Beziers
-    H_M = cv.bezierMatrix(P0, P1, P2, P3)
-
-    # Arreglo de numeros entre 0 y 1
-    ts = np.linspace(0.0, 1.0, N)
-    
-    # The computed value in R3 for each sample will be stored here
-    curve = np.ndarray(shape=(len(ts), 3), dtype=float)
-    
-    # Se llenan los puntos de la curva
-    for i in range(len(ts)):
-        T = cv.generateT(ts[i])
-        curve[i, 0:3] = np.matmul(H_M, T).T
-        
-    return curve
-
-
-def randomCurva(v):
-    # Funcion que crea aleatoriamente una curva de Hermite o de Bezier con v puntos
-    a = randint(0,1)
-    curva = []
-    if a == 1:
-        curva = bezierRand(v)
-    else:
-        curva = hermiteRand(v)
-    return curva
-
-
 def createAla():
 # Funcion para crear un ala negra
 
@@ -0,0 +1,259 @@
+""" Logica del juego independiente de GLFW y OpenGL """
+
+import random
+import numpy as np
+from contextlib import nullcontext
+from model import Controller, Player
+from collision import SpatialHash, ESTRUCTURAS
+from population import Population
+from curves import randomMatrices
+
+
+PUNTOS_MIN = 3000 # Cantidad minima de puntos de la curva de un npc
+PUNTOS_MAX = 6000 # Cantidad maxima de puntos de la curva de un npc
+
+
+class Simulation():
+    # Simulacion de Beauchefville: oleadas de npcs, movimiento, contagio, conversion,
+    # colisiones del jugador y condiciones de victoria/derrota. No necesita ventana ni
+    # contexto de OpenGL; el renderer solo lee su estado a traves de SimulationView.
+    def __init__(self, Z, H, T, P, controller=None, lado=None, seed=None, limitePool=None, banco=None, colisiones=None, metricas=None, monitor=None):
+        self.Z = Z # Zombies que entran en cada oleada
+        self.H = H # Humanos que entran en cada oleada
+        self.T = T # Cada cuantos segundos entra una oleada
+        self.P = P # Probabilidad de contagio y de conversion a zombie
+
+        # Semilla opcional para poder reproducir una partida
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+
+        # Lado en que aparece la tienda (1 derecha, -1 izquierda)
+        if lado is None:
+            lado = random.choice([1, -1])
+        self.lado = lado
+
+        self.banco = banco # Banco de curvas precalculadas (CurveBank) opcional
+        self.poblacion = Population(limitePool=limitePool, banco=banco) # Poblacion de npcs
+        # Estructura para acotar las colisiones a los npcs cercanos (SpatialHash o SweepAndPrune),
+        # o su nombre en ESTRUCTURAS ("grilla" o "sweep")
+        if colisiones is None:
+            colisiones = SpatialHash()
+        elif isinstance(colisiones, str):
+            colisiones = ESTRUCTURAS[colisiones]()
+        self.grid = colisiones
+
+        # Se instancia el modelo del jugador
+        if controller is None:
+            controller = Controller()
+        self.player = Player(0.08)
+        self.player.set_controller(controller)
+
+        self.tiempo = 0.0 # Tiempo simulado total
+        self.seg = 0.0 # Variable para contar los T segundos
+        self.ticks = 0 # Cantidad de pasos simulados
+        self.creados = 0 # Cantidad de npcs creados, usada para nombrarlos
+        self.fin = 0 # Variable para que no se pueda ganar y perder al mismo tiempo
+        self.gano = False # El jugador llego a la tienda
+        self.perdio = False # El jugador choco con un zombie o se convirtio en uno
+
+        # Contadores del tick actual
+        self.metricas = metricas # Escritor de metricas por tick (MetricsWriter) opcional
+        self.monitor = monitor # Monitor con tiempos por fase (PerformanceMonitor) opcional
+        self.spawns = 0
+        self.despawns = 0
+        self.conversiones = 0
+
+    def fase(self, nombre):
+        # Contexto que mide la fase dada en el monitor, si lo hay
+        if self.monitor is None:
+            return nullcontext()
+        return self.monitor.phase(nombre)
+
+    def crearNpcs(self, zombies, humanos):
+        # Se crean de una vez los npcs de una oleada, cada uno con una curva aleatoria.
+        # Solo se guarda la matriz de cada curva; las posiciones se evaluan cuando se necesitan
+        k = zombies + humanos
+        eszombie = np.concatenate((np.ones(zombies, dtype=np.int8), np.zeros(humanos, dtype=np.int8)))
+        infectado = (self.P >= np.random.uniform(0.0, 1.0, k)).astype(np.int8)
+        nombres = [str(self.creados + i) for i in range(k)]
+        if self.banco is None:
+            vels = np.random.randint(PUNTOS_MIN, PUNTOS_MAX + 1, k) # Cantidad de puntos de cada curva
+            self.poblacion.agregarLote(randomMatrices(k), vels, eszombie, infectado, 0.08, nombres)
+        else:
+            # Con un banco de curvas, cada npc solo elige una curva ya calculada
+            vels, filas = self.banco.elegir(k)
+            self.poblacion.agregarLote(np.zeros((k, 3, 4)), vels, eszombie, infectado, 0.08, nombres, filas)
+        self.creados += k
+        self.spawns += k
+
+    def oleada(self):
+        # Cada T segundos entran Z zombies y H humanos
+        self.crearNpcs(self.Z, self.H)
+
+        # Los infectados, en base a la probabilidad dada, pueden cambiar a zombies
+        self.conversiones += len(self.poblacion.convertir(self.P))
+
+        # Si el jugador esta infectado, se ve si cambia a zombie
+        if self.player.infectado:
+            self.player.conversion(self.P)
+
+    def actualizarNpcs(self):
+        # Contagio entre npcs y avance por sus curvas
+        lista = self.poblacion.vistas
+        with self.fase("collision"):
+            self.grid.rebuild(lista)
+
+            for a in lista:
+                if a.eszombie == 0: # Si no es un zombie:
+                    if a.collision(lista, self.grid): # Si choca con un zombie, pasa a ser zombie
+                        a.infectado = 0
+                        a.eszombie = 1
+                        self.conversiones += 1
+                    if a.infectado == 0: # Si choca con un infectado, se infecta
+                        if a.collisionI(lista, self.grid):
+                            a.infectado = 1
+
+        with self.fase("npc update"):
+            # Los zombies nunca quedan marcados como infectados
+            self.poblacion.limpiarZombies()
+
+            # Se le asigna una nueva posicion a cada npc; los que alcanzan su ultima posicion se
+            # sacan de la grilla mientras sus vistas siguen ligadas y se borran sin copiar sus
+            # datos, pues vuelven directo a la reserva
+            terminados = self.poblacion.terminados()
+            for slot in terminados.tolist():
+                self.grid.remove(self.poblacion.vistas[slot])
+            quitados = self.poblacion.quitarSlots(terminados, copiar=False)
+            self.poblacion.actualizarPosiciones()
+            self.despawns += len(quitados)
+            self.poblacion.liberar(quitados)
+
+    def actualizarJugador(self, dt):
+        # Colisiones del jugador y condiciones de victoria/derrota
+        lista = self.poblacion.vistas
+        player = self.player
+
+        # Se verifica si el jugador ha sido contagiado por un npc
+        player.contagio(lista, self.grid)
+
+        # Si choca con un zombie o debido a una infeccion se convierte en uno, pierde
+        if player.collision(lista, self.grid) and self.fin == 0 or player.zombie:
+            self.fin = 1
+            self.perdio = True
+
+        # Si llega a la tienda, gana
+        if player.llegar(self.lado) and self.fin == 0:
+            self.fin = 1
+            self.gano = True
+
+        # Se actualiza la posicion del jugador
+        player.update(dt)
+
+    def step(self, dt):
+        # Se avanza la simulacion en dt segundos
+        self.tiempo += dt
+        self.seg += dt
+        self.ticks += 1
+        self.spawns = 0
+        self.despawns = 0
+        self.conversiones = 0
+        chequeos = self.grid.chequeos
+
+        if self.seg > self.T: # Cada T segundos:
+            self.seg = 0
+            with self.fase("spawn"):
+                self.oleada()
+            if self.monitor is not None:
+                self.monitor.event("oleada", {"zombies": self.Z, "humanos": self.H, "npcs": self.poblacion.n})
+
+        self.actualizarNpcs()
+        with self.fase("player update"):
+            self.actualizarJugador(dt)
+
+        if self.metricas is not None:
+            self.registrarMetricas(self.grid.chequeos - chequeos)
+
+    def registrarMetricas(self, chequeos):
+        # Se entregan los contadores de este tick al escritor de metricas
+        n = self.poblacion.n
+        zombies = int(np.count_nonzero(self.poblacion.eszombie[:n]))
+        infectados = int(np.count_nonzero(self.poblacion.infectado[:n]))
+        self.metricas.registrar(self.ticks, self.tiempo, n - zombies, infectados, zombies,
+            self.spawns, self.despawns, self.conversiones, chequeos)
+
+    def estadisticasPool(self):
+        # Se retorna el uso de la reserva de npcs
+        return {"npcs": self.poblacion.registros.estadisticas()}
+
+    def vista(self):
+        # Se retorna una vista de solo lectura del estado
+        return SimulationView(self)
+
+
+class SimulationView():
+    # Vista de solo lectura del estado de una Simulation, pensada para el renderer.
+    # Los arreglos retornados no se pueden modificar.
+    def __init__(self, sim):
+        self._sim = sim
+
+    def _arreglo(self, arreglo):
+        vista = arreglo[:self._sim.poblacion.n]
+        vista.flags.writeable = False
+        return vista
+
+    @property
+    def n(self):
+        return self._sim.poblacion.n
+
+    @property
+    def x(self):
+        return self._arreglo(self._sim.poblacion.x)
+
+    @property
+    def y(self):
+        return self._arreglo(self._sim.poblacion.y)
+
+    @property
+    def size(self):
+        return self._arreglo(self._sim.poblacion.size)
+
+    @property
+    def eszombie(self):
+        return self._arreglo(self._sim.poblacion.eszombie)
+
+    @property
+    def infectado(self):
+        return self._arreglo(self._sim.poblacion.infectado)
+
+    @property
+    def playerPos(self):
+        return tuple(self._sim.player.pos)
+
+    @property
+    def playerSize(self):
+        return self._sim.player.size
+
+    @property
+    def playerInfectado(self):
+        return self._sim.player.infectado
+
+    @property
+    def lado(self):
+        return self._sim.lado
+
+    @property
+    def tiempo(self):
+        return self._sim.tiempo
+
+    @property
+    def fin(self):
+        return self._sim.fin
+
+    @property
+    def gano(self):
+        return self._sim.gano
+
+    @property
+    def perdio(self):
+        return self._sim.perdio
@@ -1,5 +1,10 @@
 """ T1: Beauchefville """
 
+import time
+# Inicio del programa, para medir el tiempo hasta el primer frame
+inicio = time.perf_counter()
+
+import os
 import sys
 import math
 import glfw
@@ -10,17 +15,70 @@ import grafica.easy_shaders as es
 import shader as sh
 import grafica.transformations as tr
 import grafica.performance_monitor as pm
+import grafica.frame_trace as ft
 import grafica.scene_graph as sg
+import grafica.gl_state as gls
+import grafica.program_cache as pc
+import grafica.texture_atlas as ta
+import grafica.sprite_batch as sb
 import grafica.ex_curves as cv
 from shapes import *
 from model import *
+from simulation import Simulation
+from collision import ESTRUCTURAS
+from metrics import MetricsWriter
+from curve_bank import CurveBank
 from random import *
 
 
+USO = "Uso: python survival.py Z H T P [banco] [--trace archivo] [--colisiones grilla|sweep] [--metricas archivo.csv] [--sin-cache-shaders]"
+
+def opcion(nombre, variable):
+    # Valor de una opcion "--nombre valor" de la linea de comandos (que se quita de sys.argv),
+    # o de la variable de entorno indicada si no se entrega
+    if nombre not in sys.argv:
+        return os.environ.get(variable)
+    i = sys.argv.index(nombre)
+    if i + 1 >= len(sys.argv) or sys.argv[i + 1].startswith("--"):
+        print("Falta el valor de " + nombre)
+        print(USO)
+        sys.exit(1)
+    valor = sys.argv[i + 1]
+    del sys.argv[i:i + 2]
+    return valor
+
+# Opcionalmente se exporta la linea de tiempo de los frames (formato de Chrome trace),
+# con --trace <archivo> o con la variable de entorno BEAUCHEF_TRACE
+rutaTrace = opcion("--trace", "BEAUCHEF_TRACE")
+
+# Estructura de colisiones entre npcs: "grilla" (SpatialHash, por defecto) o "sweep" (SweepAndPrune),
+# con --colisiones <nombre> o con la variable de entorno BEAUCHEF_COLISIONES
+colisiones = opcion("--colisiones", "BEAUCHEF_COLISIONES") or "grilla"
+if colisiones not in ESTRUCTURAS:
+    print("Estructura de colisiones desconocida: " + colisiones)
+    print(USO)
+    sys.exit(1)
+
+# Opcionalmente se escriben las metricas de cada tick de la simulacion en un CSV,
+# con --metricas <archivo> o con la variable de entorno BEAUCHEF_METRICAS
+rutaMetricas = opcion("--metricas", "BEAUCHEF_METRICAS")
+
+# Los programas de shaders ya enlazados se guardan en disco y se cargan en las siguientes
+# ejecuciones, en vez de compilarlos. El directorio se cambia con la variable de entorno
+# BEAUCHEF_SHADER_CACHE y la cache se desactiva con --sin-cache-shaders
+if "--sin-cache-shaders" in sys.argv:
+    sys.argv.remove("--sin-cache-shaders")
+else:
+    pc.cache.directory = os.environ.get("BEAUCHEF_SHADER_CACHE", ".shader_cache")
+
 # We will use 32 bits data, so an integer has 4 bytes
 # 1 byte = 8 bits
 SIZE_IN_BYTES = 4
 
+if len(sys.argv) < 5:
+    print(USO)
+    sys.exit(1)
+
 print("Zombies que entran: ",sys.argv[1])
 print("Humanos que entran: ",sys.argv[2])
 print("Cada cuantos segundos entran: ",sys.argv[3])
@@ -31,15 +89,11 @@ H = int(sys.argv[2])
 T = float(sys.argv[3])
 P = float(sys.argv[4])
 
-# Clase controlador con variables para manejar el estado de ciertos botones
-class Controller:
-    def __init__(self):
-        self.fillPolygon = True
-        self.is_w_pressed = False
-        self.is_s_pressed = False
-        self.is_a_pressed = False
-        self.is_d_pressed = False
-        self.scan = False
+# Opcionalmente, un directorio con el banco de curvas precalculadas
+banco = None
+if len(sys.argv) > 5:
+    print("Banco de curvas: ",sys.argv[5])
+    banco = CurveBank(sys.argv[5])
 
 # we will use the global controller as communication with the callback function
 controller = Controller()
@@ -82,6 +136,12 @@ def on_key(window, key, scancode, action, mods):
         if action ==glfw.PRESS:
             controller.scan = not controller.scan
 
+    # Caso de detectar la tecla [P], se muestran los tiempos por fase del frame
+    if key == glfw.KEY_P and action == glfw.PRESS:
+        print(perfMonitor.phaseReport())
+        print("Productos de matrices en el ultimo frame:", sg.lastFrameMatmuls,
+            "- transformaciones reutilizadas:", sg.lastFrameCachedTransforms)
+
     # Caso en que se cierra la ventana
     elif key == glfw.KEY_ESCAPE and action ==glfw.PRESS:
         glfw.set_window_should_close(window, True)
@@ -117,15 +177,13 @@ if __name__ == "__main__":
     # Pipeline para dibujar los pastos
     pastos = es.SimpleTransformShaderProgram()
     
-    # Pipeline para dibujar shapes con texturas
-    tex_pipeline = es.SimpleTextureTransformShaderProgram()
-    
-    # Pipelines "gafas detectoras" para identificar humanos infectados
-    tex_humano = sh.ScannerShader()
-    tex_player = sh.PlayerShader()
-    
-    # Pipeline para dibujar shapes con texturas de win/lose
-    end_pipeline = sh.FadingShader()
+    # Pipeline para dibujar los sprites por lotes: fondo, tienda, hinata, las "gafas detectoras" del
+    # jugador (con el color de cada vertice) y las pantallas de win/lose
+    tex_batch = es.SpriteBatchShaderProgram()
+
+    # Pipeline para dibujar a todos los npcs con un solo llamado (instancias); su tinte marca
+    # a los humanos infectados cuando se activa el scanner
+    tex_instancias = es.SimpleInstancedTextureShaderProgram()
 
     ################################################################################### 
 
@@ -138,99 +196,42 @@ if __name__ == "__main__":
 
     ################################################################################### 
 
-    # Grafos de escena de los adornos
+    # Grafos de escena de los adornos, compilados en listas planas de dibujo.
+    # Sus animaciones solo cambian transformaciones, asi que las listas no se reconstruyen
     pajarosScene = createBandadas(pajaros)
     pastosScene = createPasto(pastos)
+    sg.compileSceneGraphNode(pajarosScene)
+    sg.compileSceneGraphNode(pastosScene)
 
-    # Shapes con texturas de los zombies y humanos
-    npc0 = createTextureGPUShape(bs.createTextureQuad(1,1), tex_pipeline, "sprites/humano.png")
-    npc1 = createTextureGPUShape(bs.createTextureQuad(1,1), tex_pipeline, "sprites/zombie.png")
-    
-    
-    def crearNpc(scene, es, lista, prob):
-        # Funcion que crea un npc y le asigna la textura de humano o zombie en base a los parametros
-
-        nombre = str(uniform(0.0, 10.0)) # Nombre aleatorio para asignar al nodo
-        
-        inf = uniform(0.0,1.0)
-
-        v = randint(3000,6000) # Cantidad de puntos que tendrá la curva
-        
-        # Se crea el nodo
-        npcNode = sg.SceneGraphNode(nombre)
-        if es == 0:
-            npcNode.childs = [npc0]
-        else:
-            npcNode.childs = [npc1]
-        scene.childs += [npcNode]
-
-        linea = randomCurva(v)
+    # Todos los sprites en una sola textura: los sprites del lote y los npcs comparten el atlas,
+    # asi no hay que cambiar de textura entre ellos
+    atlas = ta.TextureAtlas.fromDirectory("sprites")
 
-        npc = NPC(0, 1, 0.08, es)
-        npc.set_model(npcNode)
-        npc.nombre = nombre
-        npc.vel = v
-        npc.mov = linea
-        
-        if prob >= inf:
-            npc.infectado = 1
+    # Shape de los npcs. Cada instancia es (x, y, tamaño, sprite), con sprite 0 = humano y
+    # 1 = zombie (regiones del atlas). El arreglo de instancias se reutiliza entre frames
+    npcs = createInstancedTextureGPUShape(bs.createTextureQuad(1,1), tex_instancias, ["humano", "zombie"], atlas)
+    instancias = np.zeros((64, 4), dtype=np.float32)
 
-        lista.append(npc)
+    # Lote de sprites: se llena durante el frame y se dibuja en un solo llamado
+    batch = sb.SpriteBatch(tex_batch, atlas)
 
     ################################################################################### 
 
-    # Se instancia el modelo de hinata
-    player = Player(0.08)
-
-    # Shape con la textura de hinata
-    hinata = createTextureGPUShape(bs.createTextureQuad(1,1), tex_pipeline, "sprites/hinata.png")
-    hinataNode = sg.SceneGraphNode("Hinata")
-    hinataNode.childs = [hinata]
-
-    # Se indican las referencias del nodo y el controller al modelo
-    player.set_model(hinataNode)
-    player.set_controller(controller)
-
-
-    # Shape con la textura de la tienda
-    lado = randint(1,2) # Variable que asigna a que lado aparece la tienda
-    if lado == 2:
-        lado = -1
-
-    tienda = createTextureGPUShape(createTexCuad(1,0.75,1,1), tex_pipeline, "sprites/tienda.png")
-    tiendaNode = sg.SceneGraphNode("tienda")
-    tiendaNode.transform = tr.matmul([tr.translate(0.775*lado, 0.845, 0), tr.uniformScale(0.2)])
-    tiendaNode.childs = [tienda]
-    
-    # Shape con la textura del fondo
-    fondo = createTextureGPUShape(createTexCuad(1,1,1,1), tex_pipeline, "sprites/fondo.png")
-    fondoNode = sg.SceneGraphNode("fondo")
-    fondoNode.childs = [fondo]
+    # Monitor de fps y de tiempos por fase del frame
+    trace = ft.FrameTrace(rutaTrace) if rutaTrace else None
+    perfMonitor = pm.PerformanceMonitor(glfw.get_time(), 0.5, trace=trace)
 
-    # Shape con la textura si se pierde
-    lose = createTextureGPUShape(bs.createTextureQuad(1,1), tex_pipeline, "sprites/death.png")
-    loseNode = sg.SceneGraphNode("lose")
-    loseNode.transform = tr.translate(0,5,0)
-    loseNode.childs = [lose]
+    # Se instancia la simulacion, que contiene al modelo de hinata y a los npcs
+    metricas = MetricsWriter(rutaMetricas) if rutaMetricas else None
+    sim = Simulation(Z, H, T, P, controller, banco=banco, colisiones=colisiones, metricas=metricas, monitor=perfMonitor)
+    estado = sim.vista()
 
-    # Shape con la textura si se gana
-    win = createTextureGPUShape(bs.createTextureQuad(1,1), tex_pipeline, "sprites/win.png")
-    winNode = sg.SceneGraphNode("win")
-    winNode.transform = tr.translate(0,5,0)
-    winNode.childs = [win]
-
-    # Se crea el grafo de escena con texturas y se agregan los nodos
-    tex_scene = sg.SceneGraphNode("textureScene")
-    tex_scene.childs = [fondoNode, hinataNode, tiendaNode]
-
-    # Se crea el grafo de escena con texturas de victoria y derrota y se agregan sus nodos
-    end_scene = sg.SceneGraphNode("textureScene")
-    end_scene.childs = [loseNode, winNode]
-
-    perfMonitor = pm.PerformanceMonitor(glfw.get_time(), 0.5)
-
-    # Variable para que no se pueda ganar y perder al mismo tiempo
-    fin = 0
+    # Transformaciones de los sprites fijos, aplicadas al cuadrado unitario del lote
+    lado = estado.lado # Variable que asigna a que lado aparece la tienda
+    fondoTransform = tr.scale(2, 2, 1)
+    tiendaTransform = tr.matmul([tr.translate(0.775*lado, 0.845, 0), tr.uniformScale(0.2), tr.scale(2, 1.5, 1)])
+    loseTransform = tr.scale(2, 0.5, 1)
+    winTransform = tr.scale(2, 1, 1)
 
     # Indicador del fade de las pantallas win/lose
     fading = False
@@ -240,37 +241,27 @@ if __name__ == "__main__":
     glfw.swap_interval(0)
     t0 = glfw.get_time()
 
-    seg = 0 # Variable para contar los T segundos
     aleteo = 0 # Variable para contar cada segundo que se usara para el aleteo
     updown = 1 # Variable que indica si las alas estan hacia arriba o hacia abajo
 
-    lista = [] # Lista para ser llenada con los npcs
+    # Llamadas a nodos para aplicar transformaciones
+    bandada1 = sg.findNode(pajarosScene, "Bandada1")
+    bandada2 = sg.findNode(pajarosScene, "Bandada2")
+    pajaro = sg.findNode(pajarosScene, "Pajaro")
+    verde = sg.findNode(pastosScene, "pasto")
 
     ################################################################################### 
 
     # Application loop
+    primerFrame = True
     while not glfw.window_should_close(window):
         
-        ################################################################################### 
-        # Llamadas a nodos para aplicar transformaciones
-
-        bandada1 = sg.findNode(pajarosScene, "Bandada1")
-        bandada2 = sg.findNode(pajarosScene, "Bandada2")
-
-
-        pajaro = sg.findNode(pajarosScene, "Pajaro")
-
-        verde = sg.findNode(pastosScene, "pasto")
-
-        ################################################################################### 
-        
         # Variables del tiempo
         t1 = glfw.get_time()
         delta = t1 -t0
         t0 = t1
 
         v = t1*-0.5
-        seg += delta
         aleteo += delta
 
         # Movimiento de las bandadas    
@@ -285,47 +276,31 @@ if __name__ == "__main__":
             pajaro.transform = tr.rotationX(math.pi*updown)
             updown += 1
 
-        if seg > T: # Cada T segundos:
-            seg = 0
-            for z in range(Z): # Se crean Z zombies
-                crearNpc(tex_scene,1,lista,P)
-            for h in range(H): # Se crean H humanos
-                crearNpc(tex_scene,0,lista,P)
-            for a in lista:
-                if a.infectado == 1: # Si estan infectados, se ve, en base a la probabilidad dada, si cambian a zombies
-                    if a.conversion(P):
-                        sg.findNode(tex_scene,a.nombre).childs = [npc1]
-                        a.infectado = 0
-                        a.eszombie = 1
-            if player.infectado: # Si el jugador esta infectado, se ve, en base a la probabilidad dada, si cambia a zombie
-                player.conversion(P)
-
-
-        for a in lista:
-            a.update() # Se actualiza la posicion de cada npc
-            if a.eszombie == 0: # Si no es un zombie:
-                if a.collision(lista): # Si choca con un zombie, pasa a ser zombie
-                    sg.findNode(tex_scene,a.nombre).childs = [npc1]
-                    a.infectado = 0
-                    a.eszombie = 1
-                if a.infectado == 0: # Si choca con un infectado, se infecta
-                    if a.collisionI(lista):
-                        a.infectado = 1
-            if a.eszombie == 1: # Si es un zombie:
-                a.infectado = 0 # Para evitar casos en que ciertos zombies se veian afectados por el scanner
-
-            # Se le asigna una nueva posicion a cada npc
-            a.posA += 1
-            a.posS += 1
-            if a.posS == a.vel + 1: # Si un npc alcanza su ultima posicion, se borra para ahorrar memoria
-                lista.remove(a)
-                tex_scene.childs.remove(sg.findNode(tex_scene,a.nombre))
-          
+        # Se avanza la simulacion: oleadas, movimiento y contagio de los npcs y colisiones del jugador
+        sim.step(delta)
+
+        # Se copian los datos de cada npc al arreglo de instancias y se suben a la GPU.
+        # Sin npcs (antes de la primera oleada) no se dibuja ninguna instancia
+        if len(instancias) < estado.n:
+            instancias = np.zeros((2 * estado.n, 4), dtype=np.float32)
+        datosNpcs = instancias[:estado.n]
+        datosNpcs[:, 0] = estado.x
+        datosNpcs[:, 1] = estado.y
+        datosNpcs[:, 2] = estado.size
+        datosNpcs[:, 3] = estado.eszombie
+        npcs.fillInstances(datosNpcs)
+
+        # Se posiciona a hinata segun el estado de la simulacion
+        px, py = estado.playerPos
+        hinataTransform = tr.matmul([tr.translate(px, py, 0), tr.scale(estado.playerSize, estado.playerSize, 1)])
+
         ###################################################################################  
 
         # Measuring performance
         perfMonitor.update(glfw.get_time())
-        glfw.set_window_title(window, title + str(perfMonitor))
+        gls.state.beginFrame()
+        sg.beginFrame()
+        glfw.set_window_title(window, title + str(perfMonitor) + f" [{gls.state.elidedLastFrame()} GL calls elided]")
         # Using GLFW to check for input events
         glfw.poll_events()
 
@@ -341,69 +316,92 @@ if __name__ == "__main__":
 
         ################################################################################### 
 
-        # Se verifica si el jugador ha sido contagiado por un npc
-        player.contagio(lista)
-
-        # Se llama al metodo del player para detectar colisiones
-        if player.collision(lista) and fin == 0 or player.zombie:
-            # Si choca con un zombie o tiene mala suerte y debido a una infeccion se convierte en uno, se cambia su textura a la de un zombie y se muestra la pantalla de lose
-             fin = 1
-             loseNode.transform = tr.matmul([tr.scale(2,0.5,1),tr.translate(0,0,0)])
-             sg.findNode(tex_scene, "Hinata").childs = [npc1]
-             fading = True
-        if player.llegar(lado) and fin == 0:
-            # Si llega a la tienda se muestra la pantalla de win
-             fin = 1
-             winNode.transform = tr.matmul([tr.scale(2,1,1),tr.translate(0,0,0)])
+        # Si choca con un zombie o tiene mala suerte y debido a una infeccion se convierte en uno,
+        # se cambia su textura a la de un zombie y se muestra la pantalla de lose.
+        # Si llega a la tienda se muestra la pantalla de win
+        if estado.perdio or estado.gano:
              fading = True
 
         # Se aplica el fading a las pantallas de win/lose cuando sea necesario
         if fading and fade <= 0.99:
             fade += 0.001
 
-        # Se llama al metodo del player para actualizar su posicion
-        player.update(delta)
-
         ################################################################################### 
 
-        # Se dibuja el grafo de escena con texturas
-        glUseProgram(tex_pipeline.shaderProgram)
-        sg.drawSceneGraphNode(tex_scene, tex_pipeline, "transform")
-
-        # Si se activa el scanner, se cambia el shader para los humanos infectados (Verde=Infectado)
-        if controller.scan:    
-            for a in lista:
-                if a.infectado == 1:
-                    glUseProgram(tex_humano.shaderProgram)
-                    sg.drawSceneGraphNode(sg.findNode(tex_scene, a.nombre), tex_humano, "transform")
-
-
-        # Si se activa el scanner, se cambia el shader para el jugador. (Azul=Sano, Rojo=Infectado)
-        if controller.scan and fin != 1:
-            glUseProgram(tex_player.shaderProgram)
-            if player.infectado:
-                sh.drawHinataScan(sg.findNode(tex_scene, "Hinata"), tex_player, "transform", 1)
+        # Se dibujan el fondo, hinata y la tienda en un solo lote
+        perfMonitor.startPhase("scene draw")
+        gls.state.useProgram(tex_batch.shaderProgram)
+        batch.beginFrame()
+        batch.add("fondo", fondoTransform)
+        batch.add("zombie" if estado.perdio else "hinata", hinataTransform)
+        batch.add("tienda", tiendaTransform)
+        batch.flush()
+
+        # Todos los npcs en un solo llamado
+        gls.state.useProgram(tex_instancias.shaderProgram)
+        tex_instancias.setTint(1.0, 1.0, 1.0, 1.0)
+        tex_instancias.drawCall(npcs)
+        perfMonitor.endPhase("scene draw")
+
+        perfMonitor.startPhase("scan overlay")
+        # Si se activa el scanner, los humanos infectados se vuelven a dibujar teñidos (Verde=Infectado)
+        if controller.scan:
+            tex_instancias.setTint(0.1, 1.0, 0.1, 1.0)
+            npcs.fillInstances(datosNpcs[estado.infectado == 1])
+            tex_instancias.drawCall(npcs)
+
+        # Si se activa el scanner, tambien se tiñe al jugador con el lote. (Azul=Sano, Rojo=Infectado)
+        if controller.scan and estado.fin != 1:
+            gls.state.useProgram(tex_batch.shaderProgram)
+            if estado.playerInfectado:
+                batch.add("hinata", hinataTransform, (1.0, 0.0, 0.0, 1.0))
             else:
-                sh.drawHinataScan(sg.findNode(tex_scene, "Hinata"), tex_player, "transform", 0)
+                batch.add("hinata", hinataTransform, (0.0, 1.0, 1.0, 1.0))
+            batch.flush()
+        perfMonitor.endPhase("scan overlay")
 
         # Se dibujan los grafos de escena con los adornos
-        glUseProgram(pastos.shaderProgram)
-        sg.drawSceneGraphNode(pastosScene, pastos, "transform")
+        perfMonitor.startPhase("decorations")
+        gls.state.useProgram(pastos.shaderProgram)
+        sg.drawCompiledSceneGraphNode(pastosScene, pastos, "transform")
 
-        glUseProgram(pajaros.shaderProgram)
-        sg.drawSceneGraphNode(pajarosScene, pajaros, "transform")
+        gls.state.useProgram(pajaros.shaderProgram)
+        sg.drawCompiledSceneGraphNode(pajarosScene, pajaros, "transform")
         
-        # Se dibuja el grafo de escena con las pantallas de win/lose
-        glUseProgram(end_pipeline.shaderProgram)
-        sh.drawSceneGraphNodeF(end_scene, end_pipeline, "transform", fade) # , tr.identity() , variable)
+        # Se dibujan las pantallas de win/lose, con su opacidad segun el fade
+        if fading:
+            gls.state.useProgram(tex_batch.shaderProgram)
+            if estado.perdio:
+                batch.add("death", loseTransform, (1, 1, 1, fade))
+            if estado.gano:
+                batch.add("win", winTransform, (1, 1, 1, fade))
+            batch.flush()
+        perfMonitor.endPhase("decorations")
 
         # Once the drawing is rendered, buffers are swap so an uncomplete drawing is never seen.
+        perfMonitor.startPhase("buffer swap")
         glfw.swap_buffers(window)
+        perfMonitor.endPhase("buffer swap")
+
+        if primerFrame:
+            primerFrame = False
+            print("Primer frame en %.1f ms (programas: %d desde la cache, %d compilados, %d rechazados)" % (
+                (time.perf_counter() - inicio) * 1000, pc.cache.loaded, pc.cache.compiled, pc.cache.rejected))
+
+    # Resumen de los tiempos por fase de toda la partida
+    print(perfMonitor.phaseReport())
+    if metricas is not None:
+        metricas.cerrar()
+    if trace is not None:
+        trace.close()
+        if trace.dropped > 0:
+            print("Eventos del trace descartados (el disco no alcanzo a escribirlos):", trace.dropped)
 
     # freeing GPU memory
     pajarosScene.clear()
     pastosScene.clear()
-    tex_scene.clear()
-    end_scene.clear()
+    batch.clear()
+    npcs.clear()
+    atlas.clear()
     
     glfw.terminate()
\ No newline at end of file
@@ -0,0 +1,59 @@
+""" Equivalencia de las estructuras de colision con la fuerza bruta """
+
+import random
+import numpy as np
+from collision import SpatialHash, SweepAndPrune
+from escenarios import crearPoblacion, crearMultitud
+
+
+def pares(npcs, estructura=None):
+    # Pares (a, b) de npcs que se tocan, revisando los candidatos de la estructura
+    if estructura is not None:
+        estructura.rebuild(npcs)
+    encontrados = set()
+    for i, a in enumerate(npcs):
+        x, y = a.posicion()
+        candidatos = npcs if estructura is None else estructura.query(x, y)
+        for b in candidatos:
+            if b is a:
+                continue
+            bx, by = b.posicion()
+            if (a.radio + b.radio)**2 > (x - bx)**2 + (y - by)**2:
+                encontrados.add((a.nombre, b.nombre))
+    return encontrados
+
+
+def resultados(npcs, estructura=None):
+    # Resultado de collision y collisionI de cada humano
+    if estructura is not None:
+        estructura.rebuild(npcs)
+    return [(bool(a.collision(npcs, estructura)), bool(a.collisionI(npcs, estructura)))
+        for a in npcs if a.eszombie == 0]
+
+
+def comprobar(npcs):
+    bruta = pares(npcs)
+    assert len(bruta) > 0
+    for estructura in (SpatialHash(), SweepAndPrune()):
+        assert pares(npcs, estructura) == bruta
+        assert resultados(npcs, estructura) == resultados(npcs)
+
+
+def test_poblacion_quieta():
+    random.seed(1)
+    comprobar(crearPoblacion(1000))
+
+
+def test_multitud_en_movimiento():
+    np.random.seed(2)
+    poblacion = crearMultitud(400)
+    estructuras = (SpatialHash(), SweepAndPrune())
+    for tick in range(5):
+        npcs = poblacion.vistas
+        bruta = pares(npcs)
+        assert len(bruta) > 0
+        # Las mismas estructuras se reconstruyen en cada tick, como en la simulacion
+        for estructura in estructuras:
+            assert pares(npcs, estructura) == bruta
+        poblacion.posA[:poblacion.n] += 40
+        poblacion.actualizarPosiciones()
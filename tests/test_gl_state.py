@@ -0,0 +1,28 @@
+""" Cache del estado de OpenGL: los objetos borrados no dejan enlaces recordados """
+
+import grafica.gl_state as gls
+import grafica.recording_gl as rgl
+
+
+def test_borrar_olvida_los_enlaces():
+    with rgl.RecordingGL().install() as gl:
+        estado = gls.GLStateCache()
+        estado.useProgram(3)
+        estado.bindVertexArray(7)
+        estado.bindTexture(9, unit=1)
+        estado.uniformLocation(3, "transform")
+
+        # OpenGL reutiliza los nombres borrados: un objeto nuevo con el mismo nombre se enlaza de verdad
+        estado.deleteProgram(3)
+        estado.deleteVertexArray(7)
+        estado.deleteTexture(9)
+        estado.useProgram(3)
+        estado.bindVertexArray(7)
+        estado.bindTexture(9, unit=1)
+        estado.uniformLocation(3, "transform")
+
+        assert estado.issued["useProgram"] == 2
+        assert estado.issued["bindVertexArray"] == 2
+        assert estado.issued["bindTexture"] == 2
+        assert estado.issued["getUniformLocation"] == 2
+        assert gl.textureBinds == 2
@@ -0,0 +1,75 @@
+""" Invariantes del despawn por swap-remove de la poblacion """
+
+import numpy as np
+from population import Population, CAMPOS
+from curves import randomMatrices
+
+
+def datos(poblacion):
+    # nombre -> valores de todos los campos de cada npc activo
+    n = poblacion.n
+    return {poblacion.nombre[i]: {campo: np.copy(getattr(poblacion, campo)[i]) for campo in CAMPOS} for i in range(n)}
+
+
+def comprobarVistas(poblacion):
+    assert len(poblacion.vistas) == len(poblacion.nombre) == poblacion.n
+    for slot, vista in enumerate(poblacion.vistas):
+        assert vista.poblacion is poblacion and vista.slot == slot
+        assert vista.nombre == poblacion.nombre[slot]
+
+
+def iguales(a, b):
+    return all(np.array_equal(a[campo], b[campo]) for campo in CAMPOS)
+
+
+def test_quitar_conserva_a_los_sobrevivientes():
+    np.random.seed(6)
+    poblacion = Population(capacidad=8)
+    creados = 0
+    for ronda in range(30):
+        k = np.random.randint(0, 40)
+        poblacion.agregarLote(randomMatrices(k), np.random.randint(3000, 6001, k), np.random.randint(0, 2, k),
+            np.random.randint(0, 2, k), 0.08, [str(creados + i) for i in range(k)])
+        creados += k
+        poblacion.actualizarPosiciones()
+
+        antes = datos(poblacion)
+        mascara = np.random.uniform(0, 1, poblacion.n) < 0.4
+        quitadosNombres = [poblacion.nombre[i] for i in np.flatnonzero(mascara)]
+        copiar = ronda % 2 == 0
+        quitados = poblacion.quitar(mascara, copiar)
+
+        # Los sobrevivientes conservan sus datos y sus vistas siguen apuntando a su slot
+        despues = datos(poblacion)
+        assert poblacion.n == len(antes) - len(quitadosNombres)
+        assert set(despues) == set(antes) - set(quitadosNombres)
+        assert all(iguales(despues[nombre], antes[nombre]) for nombre in despues)
+        comprobarVistas(poblacion)
+
+        # Las vistas quitadas quedan desligadas, con una copia de sus datos si se pidio
+        assert len(quitados) == len(quitadosNombres)
+        for vista, nombre in zip(quitados, quitadosNombres):
+            assert vista.poblacion is None
+            if copiar:
+                assert vista.nombre == nombre
+                assert iguales(vista.datos, antes[nombre])
+            else:
+                assert vista.datos is None
+        poblacion.liberar(quitados)
+
+
+def test_avanzar_quita_los_terminados():
+    np.random.seed(7)
+    poblacion = Population()
+    poblacion.agregarLote(randomMatrices(50), np.random.randint(2, 6, 50), 0, 0, 0.08, [str(i) for i in range(50)])
+    vels = dict(zip(poblacion.nombre, poblacion.vel[:50].tolist()))
+
+    # Cada npc se quita en el paso en que llega a su ultima posicion
+    for paso in range(1, 7):
+        quitados = poblacion.avanzar(copiar=False)
+        esperados = sorted(nombre for nombre, vel in vels.items() if vel == paso)
+        assert len(quitados) == len(esperados)
+        assert sorted(poblacion.nombre + esperados) == sorted(nombre for nombre, vel in vels.items() if vel >= paso)
+        comprobarVistas(poblacion)
+        poblacion.liberar(quitados)
+    assert poblacion.n == 0
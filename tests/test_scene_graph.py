@@ -0,0 +1,70 @@
+""" Indice de nombres del grafo de escena frente a un recorrido completo """
+
+import random
+import pytest
+import grafica.scene_graph as sg
+
+
+def indiceRecorrido(nodo):
+    # nombre -> [nodo, cantidad de caminos desde nodo], recorriendo todo el subarbol
+    indice = {}
+    def visitar(actual):
+        entrada = indice.setdefault(actual.name, [actual, 0])
+        assert entrada[0] is actual
+        entrada[1] += 1
+        for hijo in actual.childs:
+            visitar(hijo)
+    visitar(nodo)
+    return indice
+
+
+def comprobar(nodos):
+    for nodo in nodos:
+        assert nodo.index == indiceRecorrido(nodo)
+        for nombre, (encontrado, caminos) in nodo.index.items():
+            assert sg.findNode(nodo, nombre) is encontrado
+
+
+def test_indice_incremental():
+    random.seed(5)
+    # Nodos por niveles: solo se agregan hijos de niveles inferiores, asi el grafo no tiene ciclos
+    niveles = [[sg.SceneGraphNode("n%d_%d" % (nivel, k)) for k in range(4)] for nivel in range(4)]
+    nodos = [nodo for nivel in niveles for nodo in nivel]
+
+    for paso in range(400):
+        nivel = random.randrange(3)
+        padre = random.choice(niveles[nivel])
+        hijos = padre.childs
+        candidatos = [nodo for inferior in niveles[nivel + 1:] for nodo in inferior]
+        hijo = random.choice(candidatos)
+        operacion = random.randrange(10)
+
+        if operacion == 0:
+            hijos.append(hijo)
+        elif operacion == 1:
+            hijos.extend(random.sample(candidatos, 2))
+        elif operacion == 2:
+            hijos += [hijo]
+        elif operacion == 3 and len(hijos) < 6:
+            hijos *= random.randrange(3)
+        elif operacion == 4:
+            hijos.insert(random.randrange(len(hijos) + 1), hijo)
+        elif operacion == 5 and hijos:
+            hijos.remove(random.choice(list(hijos)))
+        elif operacion == 6 and hijos:
+            hijos.pop(random.randrange(len(hijos)))
+        elif operacion == 7 and hijos:
+            hijos[random.randrange(len(hijos))] = hijo
+        elif operacion == 8 and hijos:
+            del hijos[0:random.randrange(len(hijos)) + 1]
+        elif operacion == 9:
+            padre.childs = random.sample(candidatos, 3)
+        comprobar(nodos)
+
+
+def test_nombre_repetido():
+    raiz = sg.SceneGraphNode("raiz")
+    raiz.childs = [sg.SceneGraphNode("a")]
+    with pytest.raises(ValueError):
+        raiz.childs.append(sg.SceneGraphNode("a"))
+    comprobar([raiz])
@@ -0,0 +1,69 @@
+""" Frames de survival.py sin ventana: glfw simulado y llamadas de OpenGL registradas """
+
+import os
+import sys
+import types
+import runpy
+import shapes
+import grafica.recording_gl as rgl
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def glfwSimulado(frames, scan):
+    # Modulo con lo que survival.py usa de glfw: cada llamado a get_time avanza 5 ms y la
+    # ventana se cierra despues de la cantidad de frames dada. Con scan, se presiona la
+    # barra espaciadora en el primer frame
+    glfw = types.SimpleNamespace(KEY_W=87, KEY_S=83, KEY_A=65, KEY_D=68, KEY_P=80, KEY_SPACE=32,
+        KEY_ESCAPE=256, PRESS=1, RELEASE=0)
+    estado = {"tiempo": 0.0, "frames": 0, "callback": None}
+
+    def get_time():
+        estado["tiempo"] += 0.005
+        return estado["tiempo"]
+
+    def window_should_close(window):
+        estado["frames"] += 1
+        return estado["frames"] > frames
+
+    def poll_events():
+        if scan and estado["frames"] == 1:
+            estado["callback"](None, glfw.KEY_SPACE, 0, glfw.PRESS, 0)
+
+    def set_key_callback(window, callback):
+        estado["callback"] = callback
+
+    glfw.init = lambda: True
+    glfw.create_window = lambda *args: object()
+    glfw.get_time = get_time
+    glfw.window_should_close = window_should_close
+    glfw.poll_events = poll_events
+    glfw.set_key_callback = set_key_callback
+    for nombre in ("make_context_current", "set_window_should_close", "set_window_title",
+            "swap_buffers", "swap_interval", "terminate"):
+        setattr(glfw, nombre, lambda *args: None)
+    return glfw, estado
+
+
+def jugar(monkeypatch, frames, scan, argumentos):
+    glfw, estado = glfwSimulado(frames, scan)
+    # survival.py tambien recibe el glfw de shapes en su "import *"
+    monkeypatch.setitem(sys.modules, "glfw", glfw)
+    monkeypatch.setattr(shapes, "glfw", glfw)
+    monkeypatch.chdir(RAIZ)
+    monkeypatch.setattr(sys, "argv", ["survival.py"] + argumentos + ["--sin-cache-shaders"])
+    with rgl.RecordingGL().install(rgl.DEFAULT_MODULES + ("shapes",)) as gl:
+        runpy.run_path(os.path.join(RAIZ, "survival.py"), run_name="__main__")
+    return estado, gl
+
+
+def test_frames_sin_npcs(monkeypatch):
+    # Antes de la primera oleada no hay npcs: los frames se dibujan igual
+    estado, gl = jugar(monkeypatch, 50, True, ["5", "10", "1000", "0.3"])
+    assert estado["frames"] == 51
+
+
+def test_frames_con_oleadas(monkeypatch):
+    estado, gl = jugar(monkeypatch, 300, True, ["5", "10", "0.2", "0.3"])
+    assert estado["frames"] == 301
+    assert gl.drawCalls > 0
@@ -0,0 +1,47 @@
+""" Equivalencia de las transformaciones en lote con las de una matriz """
+
+import numpy as np
+import grafica.transformations as tr
+from population import Population
+from curves import randomMatrices
+
+
+def test_lote_igual_a_escalar():
+    rng = np.random.default_rng(3)
+    x, y, s, theta = rng.uniform(-1, 1, (4, 50))
+
+    np.testing.assert_allclose(tr.translateN(x, y, 0), [tr.translate(a, b, 0) for a, b in zip(x, y)])
+    np.testing.assert_allclose(tr.scaleN(s, s, 1), [tr.scale(a, a, 1) for a in s])
+    np.testing.assert_allclose(tr.uniformScaleN(s), [tr.uniformScale(a) for a in s])
+    np.testing.assert_allclose(tr.rotationZN(theta), [tr.rotationZ(a) for a in theta], atol=1e-6)
+    np.testing.assert_allclose(tr.identityN(3), [tr.identity()] * 3)
+
+    # Una matriz (4, 4) se comparte con todo el lote
+    esperado = [tr.matmul([tr.translate(a, b, 0), tr.rotationZ(c), tr.uniformScale(0.5)]) for a, b, c in zip(x, y, theta)]
+    out = np.empty((50, 4, 4), dtype=np.float32)
+    resultado = tr.matmulN([tr.translateN(x, y, 0), tr.rotationZN(theta), tr.uniformScale(0.5)], out)
+    assert resultado is out
+    np.testing.assert_allclose(out, esperado, atol=1e-6)
+
+
+def test_lote_vacio():
+    # Los parametros escalares no cuentan como un npc
+    vacio = np.zeros(0)
+    assert tr.translateN(vacio, vacio, 0).shape == (0, 4, 4)
+    assert tr.scaleN(vacio, vacio, 1).shape == (0, 4, 4)
+    assert tr.uniformScaleN(vacio).shape == (0, 4, 4)
+    assert tr.rotationZN(vacio).shape == (0, 4, 4)
+    assert tr.translateN(0.5, 0.5, 0).shape == (1, 4, 4)
+
+
+def test_transformaciones_poblacion():
+    np.random.seed(4)
+    poblacion = Population()
+    assert poblacion.transformaciones(np.empty((0, 4, 4), dtype=np.float32)).shape == (0, 4, 4)
+
+    poblacion.agregarLote(randomMatrices(20), np.random.randint(3000, 6001, 20),
+        np.zeros(20, dtype=np.int8), np.zeros(20, dtype=np.int8), 0.08)
+    poblacion.actualizarPosiciones()
+    esperado = [tr.matmul([tr.translate(v.posicion()[0], v.posicion()[1], 0), tr.scale(v.size, v.size, 1)])
+        for v in poblacion.vistas]
+    np.testing.assert_allclose(poblacion.transformaciones(), esperado, atol=1e-6)